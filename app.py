@@ -5,13 +5,12 @@ import uuid
 # Add the project's root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from src.pipeline import process_pdf_for_text
-from src.information_extraction.extractor import extract_entities_with_llm
-from src.information_extraction.extractor import answer_user_questions
-from src.cosdata_store import nuke_and_recreate_collection
+from src.information_extraction.extractor import stream_user_answer
+from src.job_queue import submit_job, get_job, start_workers
+from src import model_registry
+import src.embeddings  # registers the "embedding" model so PRELOAD_MODELS can warm it up
 import tempfile
-import json
-import re
+import time
 import streamlit as st 
 import pandas as pd
 from datetime import datetime
@@ -67,6 +66,13 @@ def log_feedback(question, answer, rating, comment=""):
     conn.update(worksheet="Feedback", data=updated_feedback)
     
 
+# Load and warm up the models in the background once per process (no-op on later reruns),
+# so the first user after a restart doesn't wait for them.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "embedding,gemini").split(",")
+model_registry.preload(PRELOAD_MODELS, background=True)
+# Background analysis workers (started once per process, restarted if one dies)
+start_workers()
+
 if 'message_history' not in st.session_state:
     st.session_state.message_history = []
     
@@ -75,59 +81,67 @@ if 'session_id' not in st.session_state:
     # Generate a clean, random ID for this user session
     # We use hex to avoid special characters that might break DB naming rules
     st.session_state.session_id = f"user_{uuid.uuid4().hex[:8]}"
-
-# Define the user's unique collection name
-user_collection = f"legal_aid_{st.session_state.session_id}"
 # -------------------------
     
 st.title("AI Powered Legal Aid For Common Citizens")
 upload_file = st.file_uploader("Upload a PDF", type=['pdf'])
 if upload_file is not None:
     if st.button("Analyze Document", type="primary"):
-        with st.spinner("Processing PDF... This may take a few minutes..."):
-            
-            # 1. Save the file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tem_file: 
-                tem_file.write(upload_file.getvalue()) 
-                tem_file_path = tem_file.name 
+        # 1. Save the file
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tem_file: 
+            tem_file.write(upload_file.getvalue()) 
+            tem_file_path = tem_file.name 
 
-            # 2. Capture the filename (This is our Filter Key)
-            active_doc_name = os.path.basename(tem_file_path)
-            st.session_state.active_doc_name = active_doc_name
-            # Pass the SESSION ID (not the collection name)
-            text = process_pdf_for_text(tem_file_path, st.session_state.session_id)
+        # 2. Capture the filename (This is our Filter Key)
+        active_doc_name = os.path.basename(tem_file_path)
+        st.session_state.active_doc_name = active_doc_name
 
-            # 3. Process (Pass a dummy collection name, we use Global now)
-            text = process_pdf_for_text(tem_file_path, "global")
-    
-            llm_output = extract_entities_with_llm(text)
-            data = {}
-            json_data = ""
-            try:
-                # First, try to load the entire string as JSON. This handles the new clean output.
-                data = json.loads(llm_output)
-                json_data = llm_output
-            except json.JSONDecodeError:
-                # If that fails, fall back to searching for a markdown block.
-                match = re.search(r'```(json)?\s*(\{.*\}|\[.*\])\s*```', llm_output, re.DOTALL)
-                if match:
-                    json_data = match.group(2)
-                    try:
-                        data = json.loads(json_data)
-                    except json.JSONDecodeError as e:
-                        st.error(f"Found a JSON block, but it's invalid: {e}")
-                        st.code(llm_output, language='text')
-                else:
-                    st.error("Could not parse the LLM's response as JSON.")
-                    st.code(llm_output, language='text')
+        # 3. Hand the analysis to a background worker; the page polls the job below.
+        # The job ID goes into the URL so a reload picks the same job back up.
+        job_id = submit_job("analyze_document", {
+            "file_path": tem_file_path,
+            "session_id": st.session_state.session_id,
+            "doc_name": active_doc_name,
+        })
+        st.session_state.job_id = job_id
+        st.session_state.analysis_complete = False
+        st.query_params["job"] = job_id
+
+# --- RESUME / POLL THE ANALYSIS JOB ---
+if 'job_id' not in st.session_state and "job" in st.query_params:
+    st.session_state.job_id = st.query_params["job"]
+
+job_id = st.session_state.get('job_id')
+if job_id and not st.session_state.get('analysis_complete'):
+    job = get_job(job_id)
+    if job is None:
+        st.error("This analysis job no longer exists. Please upload the document again.")
+        del st.session_state.job_id
+    elif job["status"] in ("queued", "running"):
+        stage = (job["stage"] or "queued").replace("_", " ")
+        st.progress(job["progress"] or 0.0, text=f"Processing PDF... ({stage})")
+        time.sleep(1)
+        st.rerun()
+    elif job["status"] == "failed":
+        st.error(f"Analysis failed: {job['error']}")
+        del st.session_state.job_id
+    else:
+        result = job["result"]
+        # A resumed job also restores the session it was submitted from, so the chat finds its chunks
+        st.session_state.session_id = job["payload"]["session_id"]
+        st.session_state.active_doc_name = job["payload"]["doc_name"]
+        st.session_state.file_digest = result["file_digest"]
+        if result["error"]:
+            st.error(result["error"])
+            if result["raw_output"]:
+                st.code(result["raw_output"], language='text')
+        if result["data"]:
+            # Store the data in the Streamlit session
+            st.session_state.document_text = result["text"]
+            st.session_state.llm_output = result["llm_output"]
+            st.session_state.analysis_data = result["data"]
+            st.session_state.analysis_complete = True
 
-            if data:
-                # Store the data in the Streamlit session
-                st.session_state.document_text = text
-                st.session_state.llm_output = json_data
-                st.session_state.analysis_data = data
-                st.session_state.analysis_complete = True
-                
 if st.session_state.get('analysis_complete'):
     st.divider()
     st.subheader("📝 Document Analysis Report")
@@ -251,16 +265,16 @@ if st.session_state.get('analysis_complete'):
 
         # Generate and display assistant response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                
-                # --- THIS IS THE MODIFIED LOGIC ---
-                # We no longer build 'full_context'.
-                # We just call the new RAG-powered function.
-                doc_name = st.session_state.get('active_doc_name', '')
-                response = answer_user_questions(prompt, st.session_state.session_id, doc_name)
-                # ----------------------------------
+            # --- THIS IS THE MODIFIED LOGIC ---
+            # The answer is streamed: tokens are rendered as the LLM produces them
+            # and write_stream returns the full text once the stream ends.
+            doc_name = st.session_state.get('active_doc_name', '')
+            response = st.write_stream(
+                stream_user_answer(prompt, st.session_state.session_id, doc_name, st.session_state.get('file_digest'))
+            )
+            # ----------------------------------
 
-                # Add assistant response to history
-                st.session_state.message_history.append({"role": "assistant", "content": response})
-                # This will be displayed in the next rerun
-                st.rerun()
\ No newline at end of file
+        # Add assistant response to history
+        st.session_state.message_history.append({"role": "assistant", "content": response})
+        # The next rerun shows it with the feedback buttons
+        st.rerun()
\ No newline at end of file
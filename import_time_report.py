@@ -0,0 +1,62 @@
+"""
+Import-time benchmark. Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+for each module and prints the total import time plus the slowest imports it pulled in.
+
+Usage: python import_time_report.py [module ...] [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    "src.legal_doc_check",
+    "src.pipeline",
+    "src.information_extraction.extractor",
+    "src.cosdata_store",
+]
+
+
+def measure(module):
+    """Returns (total_microseconds, [(cumulative_us, imported_name), ...]) or raises on import errors."""
+    root = os.path.abspath(os.path.dirname(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=root,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.rstrip()))
+    total = next((cumulative for cumulative, name in reversed(imports) if name.strip() == module), 0)
+    return total, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list per module")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        try:
+            total, imports = measure(module)
+        except RuntimeError as e:
+            print(f"{module}: import failed ({e})")
+            continue
+        print(f"{module}: {total / 1000:.1f} ms")
+        # Direct imports of the module: one indentation level (two spaces) below it
+        children = [(cumulative, name.strip()) for cumulative, name in imports
+                    if name.startswith("   ") and not name.startswith("     ")]
+        for cumulative, name in sorted(children, reverse=True)[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,254 @@
-from src.information_extraction.extractor import extract_entities_with_llm
-import json
-import re
+"""
+Batch ingestion CLI. Runs a directory (or manifest) of PDFs through the same stages as the
+web app - gatekeeping, text extraction, chunking, embedding and entity extraction - and
+writes one JSON record per document.
+
+Usage:
+    python main.py <directory or manifest.txt> [-o results.jsonl] [--parquet results.parquet]
+                   [--workers N] [--batch-size N] [--skip-gatekeeper] [--no-entities] [--no-embeddings]
 
-sample_text = """
-This agreement is made on August 5, 2025, between John Doe,
-residing at 123 Fictional Lane, Chandigarh, India, and Jane Smith,
-of 456 Example Ave, New Delhi. The primary property is located at
-789 Test Street, Sector 17, Chandigarh.
+Records are flushed after every batch, and each batch's paths and statuses are then appended
+to a small <output>.checkpoint file; a rerun with the same output skips every document already
+recorded there (failed documents are retried). Chunk embeddings are not written into the
+JSONL: each document's vectors go to <output stem>.embeddings/<file digest>.npy, one row per
+chunk_index, and the record points at that file. A manifest is a text file with one PDF path
+per line; relative paths are resolved against the manifest's folder and lines starting with
+# are ignored.
 """
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Add the project's root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.pipeline import extract_pages
+from src.extraction_cache import file_sha256
+
+DEFAULT_OUTPUT = "results.jsonl"
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_BATCH_SIZE = 32
+# Concurrent entity extractions per batch; the LLM gateway still enforces its own rate limit
+DEFAULT_LLM_CONCURRENCY = 8
+
+
+def find_pdfs(source):
+    """Returns the PDF paths of a directory (recursively, sorted) or of a manifest file."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return paths
+
+
+def checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+
+def embeddings_dir(output_path):
+    return os.path.splitext(output_path)[0] + ".embeddings"
+
+
+def _read_statuses(path):
+    """(path, status) of every complete JSON line of path; a truncated last line is ignored."""
+    statuses = []
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            statuses.append((record["path"], record.get("status")))
+    return statuses
+
+
+def load_checkpoint(output_path):
+    """
+    Paths already recorded for output_path (except failures), read from its small checkpoint file
+    of {"path", "status"} lines. An output written before checkpoint files existed is scanned
+    once and its checkpoint file created from it.
+    """
+    checkpoint = checkpoint_path(output_path)
+    if os.path.exists(checkpoint):
+        statuses = _read_statuses(checkpoint)
+    elif os.path.exists(output_path):
+        statuses = _read_statuses(output_path)
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"path": path, "status": status}) + "\n" for path, status in statuses)
+    else:
+        statuses = []
+    return {path for path, status in statuses if status != "failed"}
+
+
+def _open_output(output_path):
+    """Opens output_path for appending, first terminating a line left half-written by a crash."""
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as output:
+            output.seek(-1, os.SEEK_END)
+            needs_newline = output.read(1) != b"\n"
+        if needs_newline:
+            with open(output_path, "a", encoding="utf-8") as output:
+                output.write("\n")
+    return open(output_path, "a", encoding="utf-8")
+
+
+def _extract(path, ocr_workers):
+    """
+    Process-pool task: returns (file_digest, pages) or raises for unreadable files.
+    A list rather than iter_pdf_pages: a generator can't be sent back from a worker process, and
+    the gatekeeper and chunking stages need every page of the document anyway.
+    """
+    return file_sha256(path), extract_pages(path, ocr_workers)
+
+
+def _entities(text, file_digest):
+    from src.analysis import extract_analysis
+    data, _, error, _ = extract_analysis(text, file_digest)
+    return data, error
+
+
+def process_batch(paths, pool, args):
+    """Runs one batch through every stage and returns its records, in input order."""
+    records = [{"path": path, "status": "ok", "reason": None, "error": None} for path in paths]
+
+    # 1. Text extraction (parallel across documents; cached by file hash)
+    futures = [pool.submit(_extract, path, args.ocr_workers) for path in paths]
+    texts = {}
+    page_records = {}
+    for i, future in enumerate(futures):
+        try:
+            file_digest, pages = future.result()
+        except Exception as e:
+            records[i].update(status="failed", error=f"extraction: {e}")
+            continue
+        records[i]["file_digest"] = file_digest
+        records[i]["pages"] = [{"page_num": page["page_num"], "method": page["method"]} for page in pages]
+        # The text itself is kept in the chunks (with offsets), not repeated on the record
+        texts[i] = "".join(page["text"] for page in pages)
+        page_records[i] = pages
+
+    # 2. Gatekeeper, one batched call for the whole batch
+    if not args.skip_gatekeeper and texts:
+        indices = list(texts)
+        try:
+            from src.legal_doc_check import is_legal_documents
+            verdicts = is_legal_documents([texts[i] for i in indices])
+        except Exception as e:
+            # e.g. the classifier failed to load: fail this batch (retried on the next run), keep going
+            print(f"Gatekeeper failed for this batch: {e}")
+            for i in indices:
+                records[i].update(status="failed", error=f"gatekeeper: {e}")
+            texts.clear()
+            verdicts = []
+        for i, (is_legal, reason) in zip(indices, verdicts):
+            records[i]["reason"] = reason
+            if not is_legal:
+                records[i]["status"] = "rejected"
+                del texts[i]
+
+    # 3. Clause-aware chunking (with page/offset provenance) and embedding, all chunks of the batch in one call
+    from src.chunking import chunk_pages
+    chunks = {i: chunk_pages(page_records[i]) for i in texts}
+    vectors = {}
+    if not args.no_embeddings:
+        from src.embeddings import embed_texts
+        all_chunks = [chunk["text"] for i in chunks for chunk in chunks[i]]
+        if all_chunks:
+            all_vectors = embed_texts(all_chunks)
+            start = 0
+            for i in chunks:
+                vectors[i] = all_vectors[start:start + len(chunks[i])]
+                start += len(chunks[i])
+    for i in chunks:
+        records[i]["chunks"] = chunks[i]
+        records[i]["embeddings"] = None
+        if i in vectors:
+            # Row n of the sidecar is the embedding of the chunk with chunk_index n
+            sidecar = os.path.join(embeddings_dir(args.output), records[i]["file_digest"] + ".npy")
+            os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+            np.save(sidecar, np.asarray(vectors[i], dtype=np.float32))
+            records[i]["embeddings"] = os.path.relpath(sidecar, os.path.dirname(os.path.abspath(args.output)))
+
+    # 4. Entity extraction, concurrently through the LLM gateway
+    if not args.no_entities and texts:
+        with ThreadPoolExecutor(max_workers=args.llm_concurrency) as llm_pool:
+            entity_futures = {i: llm_pool.submit(_entities, text, records[i]["file_digest"]) for i, text in texts.items()}
+            for i, future in entity_futures.items():
+                try:
+                    records[i]["entities"], error = future.result()
+                except Exception as e:
+                    records[i]["entities"], error = {}, str(e)
+                if error:
+                    records[i].update(status="failed", error=f"entities: {error}")
+
+    return records
+
+
+def export_parquet(output_path, parquet_path):
+    """Writes the JSONL results (latest record per path) to a Parquet file. Needs pandas + pyarrow."""
+    import pandas as pd
+    results = pd.read_json(output_path, lines=True)
+    results = results.drop_duplicates(subset="path", keep="last")
+    results.to_parquet(parquet_path, index=False)
+    print(f"Wrote {len(results)} records to {parquet_path}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or manifest of PDFs.")
+    parser.add_argument("source", help="directory of PDFs (searched recursively) or a manifest file")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="JSONL results file; its checkpoint and embeddings are written next to it")
+    parser.add_argument("--parquet", help="also export the results to this Parquet file when done")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="documents extracted in parallel")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="OCR processes per document")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per gatekeeper/embedding batch")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY)
+    parser.add_argument("--skip-gatekeeper", action="store_true", help="process every PDF, legal or not")
+    parser.add_argument("--no-embeddings", action="store_true", help="chunk but don't embed")
+    parser.add_argument("--no-entities", action="store_true", help="skip LLM entity extraction")
+    args = parser.parse_args()
+
+    paths = find_pdfs(args.source)
+    done = load_checkpoint(args.output)
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already done, {len(todo)} to process.")
+
+    counts = {"ok": 0, "rejected": 0, "failed": 0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, _open_output(args.output) as output, \
+            _open_output(checkpoint_path(args.output)) as checkpoint:
+        for start in range(0, len(todo), args.batch_size):
+            records = process_batch(todo[start:start + args.batch_size], pool, args)
+            for record in records:
+                output.write(json.dumps(record) + "\n")
+                counts[record["status"]] += 1
+            # Flush per batch so a crash loses at most the batch in progress. The checkpoint is written
+            # after the records, so a crash in between only means the batch is processed again.
+            output.flush()
+            os.fsync(output.fileno())
+            for record in records:
+                checkpoint.write(json.dumps({"path": record["path"], "status": record["status"]}) + "\n")
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            processed = min(start + args.batch_size, len(todo))
+            elapsed = time.perf_counter() - started
+            print(f"{processed}/{len(todo)} documents ({processed / elapsed:.2f} docs/s) - {counts}")
+
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+
 
-print("Sending text to LLM for entity extraction...")
-
-llm_output = extract_entities_with_llm(sample_text)
-clean_llm_output = re.sub(r"```json", "", llm_output)
-clean_llm_output = re.sub(r"```", "", clean_llm_output)
-try:
-    data = json.loads(clean_llm_output)
-    print("------Analysis Report------\n")
-    
-    entities_data = data['entities']
-    print(f"Individual Names: {entities_data['individuals']}\n")
-    print(f"Dates: {entities_data['dates']}\n")
-    print(f"Addresses: {entities_data['addresses']}\n")
-    print(f"Phone Numbers: {entities_data['phone_numbers']}\n")
-    print(f"Emails: {entities_data['emails']}\n")
-    print(f"Company Names: {entities_data['companies']}\n")
-    print(f"Organization Names: {entities_data['organizations']}\n")
-    
-    print(f"Found {len(data['clauses'])} clauses:\n")
-    for clause in data['clauses']:
-        print(f"Clause Title: {clause['clause_title']}\n \
-            Clause Type: {clause['clause_type']}\n \
-            Clause Text: {clause['clause_text']}\n \
-            Summary in Plain English: {clause['summary_in_plain_english']}\n \
-            Potential Risks: {clause['potential_risks']}\n")
-except json.JSONDecodeError:
-    print("------ERROR------\n")
-    print("Failed to parse JSON output from LLM. Please check the output format.\n")
-    print("Raw output from LLM:", clean_llm_output)
-    
-from src.information_extraction.extractor import answer_user_questions
-
-document_text = clean_llm_output
-user_quesrion_1 = "Who is this agreement between?\n"
-print(f"Question 1: {user_quesrion_1}\n")
-answer_1 = answer_user_questions(document_text, user_quesrion_1)
-print(f"Answer 1: {answer_1}\n")
-
-user_quesrion_2 = "What is the penalty for late payment?"
-print(f"Question 2: {user_quesrion_2}\n")
-answer_2 = answer_user_questions(document_text, user_quesrion_2)
-print(f"Answer 2: {answer_2}\n")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import json
+from src.pipeline import extract_pages
+from src.extraction_cache import file_sha256, get_cached, put_cached
+
+
+def parse_analysis_output(llm_output):
+    """
+    Parses the entity/clause JSON returned by the LLM.
+    Returns (data, json_data, error); data is {} and error explains why when parsing fails.
+    """
+    from src.information_extraction.extractor import parse_llm_json
+    data = parse_llm_json(llm_output)
+    if data is None:
+        return {}, "", "Could not parse the LLM's response as JSON."
+    return data, json.dumps(data, indent=2), None
+
+
+def extract_analysis(text, file_digest):
+    """
+    LLM entity/clause extraction for a document's text, reusing the cached analysis of
+    the same file bytes. Returns (data, llm_output, error, raw_output).
+    """
+    from src.information_extraction.extractor import extract_entities_with_llm, MODEL_NAME
+
+    cached_analysis = get_cached("analysis", file_digest, MODEL_NAME)
+    if cached_analysis is not None:
+        return cached_analysis["data"], cached_analysis["llm_output"], None, None
+
+    llm_output, failed_chunks = extract_entities_with_llm(text)
+    data, json_data, error = parse_analysis_output(llm_output)
+    if error:
+        return data, json_data, error, llm_output
+    if failed_chunks:
+        # Partial results are returned but not cached, so the next run retries the missing chunks
+        return data, json_data, f"{failed_chunks} part(s) of the document could not be analysed; the results are incomplete.", None
+    if data:
+        put_cached("analysis", file_digest, MODEL_NAME, {"data": data, "llm_output": json_data})
+    return data, json_data, None, None
+
+
+def analyze_document(file_path, session_id, doc_name, progress=None, ocr_workers=None):
+    """
+    Full analysis of an uploaded PDF: text extraction, indexing for the chat assistant and
+    LLM entity/clause extraction. Identical PDFs (same bytes) reuse the cached pages and analysis.
+    progress(stage, fraction) is called as each stage starts; ocr_workers is passed to extract_pages.
+    Returns {"file_digest", "text", "data", "llm_output", "error", "raw_output"}.
+    """
+    from src.cosdata_store import index_document
+
+    def report(stage, fraction):
+        if progress is not None:
+            progress(stage, fraction)
+
+    report("extracting_text", 0.0)
+    file_digest = file_sha256(file_path)
+    # The whole page list is needed (not iter_pdf_pages): chunks can span pages, so indexing and the
+    # LLM pass both run on the full text, and extract_pages caches the complete list for re-uploads
+    pages = extract_pages(file_path, ocr_workers)
+    text = "".join(page["text"] for page in pages)
+
+    # Index the chunks (with their page numbers) for the chat assistant; a file any session
+    # already indexed is only referenced, not embedded again
+    report("indexing", 0.4)
+    index_document(text, session_id, doc_name, pages, doc_hash=file_digest)
+
+    report("extracting_entities", 0.6)
+    data, llm_output, error, raw_output = extract_analysis(text, file_digest)
+
+    report("done", 1.0)
+    return {"file_digest": file_digest, "text": text, "data": data, "llm_output": llm_output,
+            "error": error, "raw_output": raw_output}
@@ -0,0 +1,132 @@
+import bisect
+import re
+
+# Clause-aware chunking for RAG indexing. Candidate cut points are found in one regex pass
+# and ranked: clause/section starts and headings > paragraph breaks > sentence ends > line
+# breaks. Each chunk is cut at the best-ranked point between CHUNK_MIN_SIZE and CHUNK_SIZE
+# characters, so the whole document is processed in linear time. Every chunk keeps its
+# character offsets into the document text and the pages it spans.
+CHUNK_SIZE = 1000
+CHUNK_MIN_SIZE = 400
+# Characters repeated from the end of the previous chunk (snapped to a sentence start).
+# Chunks that begin at a new clause get no overlap: the clause is self-contained.
+CHUNK_OVERLAP = 150
+
+CLAUSE, HEADING, PARAGRAPH, SENTENCE, LINE = 5, 4, 3, 2, 1
+
+BOUNDARY = re.compile(
+    r"(?P<clause>^[ \t]*(?:\d+(?:\.\d+)*[.)][ \t]|(?i:article|section|clause|schedule|annexure|chapter)\b))"
+    r"|(?P<subclause>^[ \t]*\([a-z0-9]{1,4}\)[ \t])"
+    r"|(?P<heading>^[ \t]*[A-Z][A-Z0-9 ,&/()'.:-]{2,80}$)"
+    r"|(?P<paragraph>\n[ \t]*\n)"
+    r"|(?P<sentence>[.;?!][\"')\]]*(?=\s+[A-Z0-9(]))"
+    r"|(?P<line>\n)",
+    re.MULTILINE,
+)
+# Sub-clauses ("(a) ...") rank with paragraph breaks, so chunks prefer to end before a whole new clause
+PRIORITY = {"clause": CLAUSE, "heading": HEADING, "subclause": PARAGRAPH, "paragraph": PARAGRAPH,
+            "sentence": SENTENCE, "line": LINE}
+
+
+def find_boundaries(text):
+    """Returns (positions, priorities): candidate cut points in increasing order and their rank."""
+    positions, priorities = [], []
+    for m in BOUNDARY.finditer(text):
+        kind = m.lastgroup
+        # Clauses and headings start where the match starts; the others cut after the match
+        position = m.start() if kind in ("clause", "subclause", "heading") else m.end()
+        if positions and positions[-1] == position:
+            priorities[-1] = max(priorities[-1], PRIORITY[kind])
+        else:
+            positions.append(position)
+            priorities.append(PRIORITY[kind])
+    return positions, priorities
+
+
+def _best_cut(positions, priorities, low, high):
+    """Highest-priority boundary in (low, high], the latest one on ties. Returns (position, priority) or None."""
+    first = bisect.bisect_right(positions, low)
+    last = bisect.bisect_right(positions, high)
+    best = None
+    for i in range(first, last):
+        if best is None or priorities[i] >= priorities[best]:
+            best = i
+    return None if best is None else (positions[best], priorities[best])
+
+
+def _overlap_start(positions, priorities, end, overlap, floor):
+    """Start of the next chunk: the first sentence (or better) boundary within overlap chars before end."""
+    first = bisect.bisect_left(positions, max(end - overlap, floor + 1))
+    for i in range(first, bisect.bisect_left(positions, end)):
+        if priorities[i] >= SENTENCE:
+            return positions[i]
+    return end
+
+
+def _page_at(page_starts, position):
+    return max(bisect.bisect_right(page_starts, position) - 1, 0)
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, min_size=None, page_starts=None, page_nums=None):
+    """
+    Splits text into chunks of at most chunk_size characters (a single over-long word is hard-cut).
+    Returns [{"chunk_index", "text", "char_start", "char_end", "page_start", "page_end"}], where
+    text == document[char_start:char_end]. page_starts are the offsets at which each page begins
+    (see chunk_pages); without them every chunk is on page 0.
+    """
+    min_size = CHUNK_MIN_SIZE if min_size is None else min(min_size, chunk_size)
+    min_size = min(min_size, chunk_size // 2)
+    overlap = min(overlap, min_size)
+    page_starts = page_starts or [0]
+    page_nums = page_nums or list(range(len(page_starts)))
+    positions, priorities = find_boundaries(text)
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        if len(text) - start <= chunk_size:
+            end, priority = len(text), CLAUSE
+        else:
+            cut = _best_cut(positions, priorities, start + min_size, start + chunk_size)
+            if cut is None:
+                # No boundary at all: cut on the last space, or hard-cut a runaway token
+                space = text.rfind(" ", start + min_size, start + chunk_size)
+                cut = (space + 1 if space > 0 else start + chunk_size, LINE)
+            end, priority = cut
+
+        # Trim surrounding whitespace so offsets point at the text itself
+        chunk_start, chunk_end = start, end
+        while chunk_start < chunk_end and text[chunk_start].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_end > chunk_start:
+            chunks.append({
+                "chunk_index": len(chunks),
+                "text": text[chunk_start:chunk_end],
+                "char_start": chunk_start,
+                "char_end": chunk_end,
+                "page_start": page_nums[_page_at(page_starts, chunk_start)],
+                "page_end": page_nums[_page_at(page_starts, chunk_end - 1)],
+            })
+
+        if end >= len(text):
+            break
+        start = end if priority >= HEADING or not overlap else _overlap_start(
+            positions, priorities, end, overlap, start)
+    return chunks
+
+
+def chunk_pages(pages, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, min_size=None):
+    """
+    Chunks a document given as pipeline page records ({"page_num", "text", ...}). Offsets refer
+    to the concatenated page texts, i.e. the text returned by process_pdf_for_text.
+    """
+    page_starts, page_nums = [], []
+    offset = 0
+    for page in pages:
+        page_starts.append(offset)
+        page_nums.append(page["page_num"])
+        offset += len(page["text"])
+    text = "".join(page["text"] for page in pages)
+    return chunk_text(text, chunk_size, overlap, min_size, page_starts or None, page_nums or None)
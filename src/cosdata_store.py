@@ -0,0 +1,184 @@
+import os
+import hashlib
+import time
+from contextlib import contextmanager
+from src.vector_store import LocalVectorStore, CosdataVectorStore
+from src.embeddings import embed_texts, embed_query
+from src.chunking import chunk_text, chunk_pages
+from src import keyword_index, index_registry
+
+try:
+    import fcntl # POSIX only; elsewhere the local store is not locked across processes
+except ImportError:
+    fcntl = None
+
+# Which vector store backs RAG retrieval: "local" (in-process, no server) or "cosdata".
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "local")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(".cache", "vector_store"))
+COLLECTION_NAME = "legal_aid_global"
+# Hybrid retrieval: the top HYBRID_CANDIDATES dense and BM25 hits are fused by reciprocal rank.
+# KEYWORD_WEIGHT is the BM25 share of the fusion (0 = dense only, 1 = keywords only).
+KEYWORD_WEIGHT = float(os.getenv("KEYWORD_WEIGHT", 0.5))
+HYBRID_CANDIDATES = 20
+# How often index_document opportunistically garbage-collects expired sessions
+GC_INTERVAL_SECONDS = 10 * 60
+
+_store = None
+_last_gc = 0.0
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if VECTOR_STORE_BACKEND == "cosdata":
+            _store = CosdataVectorStore(COLLECTION_NAME)
+        else:
+            _store = LocalVectorStore(VECTOR_STORE_DIR)
+    return _store
+
+
+@contextmanager
+def _locked_store(exclusive=False):
+    """
+    The store, with the local backend synchronized across processes (the app and the job
+    workers share one collection on disk): readers pick up the latest saved copy, writers
+    hold an exclusive lock from reload to save.
+    """
+    store = get_store()
+    if not isinstance(store, LocalVectorStore) or fcntl is None:
+        yield store
+        return
+    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+    with open(os.path.join(VECTOR_STORE_DIR, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            store.refresh()
+            yield store
+            if exclusive:
+                store.save()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def nuke_and_recreate_collection():
+    """Drops every indexed vector (and keyword index) and starts with an empty collection."""
+    with _locked_store(exclusive=True) as store:
+        store.reset()
+    keyword_index.delete_index()
+    index_registry.clear()
+
+
+def chunk_ids(doc_hash, count):
+    return [hashlib.sha1(f"{doc_hash}:{i}".encode("utf-8")).hexdigest() for i in range(count)]
+
+
+def index_document(text, session_id, doc_name, pages=None, doc_hash=None):
+    """
+    Adds a document to the shared collection for this session. Documents are keyed by doc_hash
+    (the uploaded file's SHA-256; the text's hash if not given) and only chunked, embedded and
+    upserted the first time any session indexes them; later sessions just take a reference.
+    Pass the pipeline's page records as pages to keep page numbers in the chunk metadata.
+    Returns the document's number of chunks.
+    """
+    doc_hash = doc_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+    # Reference first, so garbage collection can't drop the document while it is being (re)used
+    index_registry.attach(session_id, doc_hash, doc_name)
+    collect_garbage_if_due()
+    if index_registry.is_indexed(doc_hash):
+        print(f"{doc_name} is already indexed, reusing its chunks.")
+        return index_registry.chunk_count(doc_hash)
+
+    chunks = chunk_pages(pages) if pages is not None else chunk_text(text)
+    if not chunks:
+        return 0
+    vectors = embed_texts([chunk["text"] for chunk in chunks])
+    ids = chunk_ids(doc_hash, len(chunks))
+    metadatas = [{"doc_hash": doc_hash, **chunk} for chunk in chunks]
+    with _locked_store(exclusive=True) as store:
+        store.upsert(ids, vectors, metadatas)
+    keyword_index.save_index(
+        doc_hash,
+        keyword_index.BM25Index(ids, [chunk["text"] for chunk in chunks]),
+        dict(zip(ids, metadatas)),
+    )
+    index_registry.add_document(doc_hash, len(chunks))
+    print(f"Indexed {len(chunks)} chunks for {doc_name}.")
+    return len(chunks)
+
+
+def release_document(session_id, doc_hash=None):
+    """Drops a session's reference to one of its documents (all of them if doc_hash is None) and collects garbage."""
+    index_registry.detach(session_id, doc_hash)
+    return collect_garbage(ttl=None)
+
+
+def collect_garbage(ttl=None):
+    """
+    Releases sessions idle for longer than ttl seconds (SESSION_TTL_SECONDS by default), then deletes
+    the vectors and keyword indexes of documents no session references. Returns the removed hashes.
+    """
+    index_registry.expire_sessions(ttl)
+    removed = []
+    for doc_hash in index_registry.unreferenced_documents():
+        # The registry row is dropped atomically with the "no references" check, and the vectors
+        # under the store lock: a session attaching meanwhile either keeps the row, or finds the
+        # document unindexed and re-indexes it after this delete
+        with _locked_store(exclusive=True) as store:
+            count = index_registry.remove_if_unreferenced(doc_hash)
+            if count is None:
+                continue
+            # Chunk ids are derived from the hash, so backends that can't delete by metadata delete by id
+            store.delete(filters={"doc_hash": doc_hash}, ids=chunk_ids(doc_hash, count))
+            keyword_index.delete_index(doc_hash)
+        removed.append(doc_hash)
+    if removed:
+        print(f"Garbage-collected {len(removed)} unreferenced documents.")
+    return removed
+
+
+def collect_garbage_if_due():
+    """Runs collect_garbage at most once every GC_INTERVAL_SECONDS per process."""
+    global _last_gc
+    if time.time() - _last_gc >= GC_INTERVAL_SECONDS:
+        _last_gc = time.time()
+        collect_garbage()
+
+
+def query_cosdata(question, session_id, doc_hash, top_k=5, keyword_weight=None):
+    """
+    Returns the text of the top_k chunks of the document doc_hash for the question: dense
+    (embedding) hits and BM25 keyword hits fused by reciprocal rank, weighted by keyword_weight
+    (KEYWORD_WEIGHT by default). Also marks the session as active, so its documents aren't collected.
+    """
+    return [hit["text"] for hit in search_chunks(question, session_id, doc_hash, top_k, keyword_weight)]
+
+
+def search_chunks(question, session_id, doc_hash, top_k=5, keyword_weight=None):
+    """Same as query_cosdata, but returns the chunks' metadata (text, chunk_index, pages, offsets)."""
+    keyword_weight = KEYWORD_WEIGHT if keyword_weight is None else keyword_weight
+    candidates = max(top_k, HYBRID_CANDIDATES)
+    index_registry.touch(session_id)
+
+    dense_hits = []
+    if keyword_weight < 1:
+        query_vector = embed_query(question)
+        # Never ask for more chunks than the document has: a filtered Cosdata search keeps
+        # fetching from the shared collection until it finds that many
+        dense_k = min(candidates, index_registry.chunk_count(doc_hash) or candidates)
+        with _locked_store() as store:
+            dense_hits = store.search(query_vector, top_k=dense_k, filters={"doc_hash": doc_hash})
+    metadatas = {hit["id"]: hit["metadata"] for hit in dense_hits}
+
+    keyword_hits = []
+    if keyword_weight > 0:
+        index, keyword_metadatas = keyword_index.load_index(doc_hash)
+        if index is not None:
+            keyword_hits = index.search(question, top_k=candidates)
+            for chunk_id, _ in keyword_hits:
+                metadatas.setdefault(chunk_id, keyword_metadatas[chunk_id])
+
+    ranked = keyword_index.reciprocal_rank_fusion(
+        [[hit["id"] for hit in dense_hits], [chunk_id for chunk_id, _ in keyword_hits]],
+        weights=[1 - keyword_weight, keyword_weight],
+    )
+    return [metadatas[chunk_id] for chunk_id in ranked[:top_k]]
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import numpy as np
+from src import model_registry
+
+# Batched embedding stage. The SentenceTransformer is loaded once per process and vectors are
+# cached on disk by (model, chunk text) hash, so re-uploads and boilerplate clauses shared
+# between documents are never embedded twice.
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite3"))
+
+
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+model_registry.register("embedding", _load_embedding_model, warmup=lambda model: model.encode(["warm up"]))
+
+
+def get_embedding_model():
+    return model_registry.get("embedding")
+
+
+def _text_key(text, model_name):
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _open_cache(cache_path):
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(cache_path, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vector BLOB)")
+    return conn
+
+
+def _load_cached(conn, keys):
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), 500): # stay under SQLite's bound-parameter limit
+        batch = keys[start:start + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+        for key, blob in rows:
+            found[key] = np.frombuffer(blob, dtype=np.float32)
+    return found
+
+
+def embed_texts(texts, batch_size=None, use_cache=True, model=None, cache_path=None):
+    """
+    Returns a float32 array of shape (len(texts), dim).
+    Only texts missing from the cache are sent to the model, de-duplicated and
+    encoded in batches of batch_size (EMBEDDING_BATCH_SIZE by default).
+    """
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    model = model or get_embedding_model()
+    model_name = getattr(model, "model_name", EMBEDDING_MODEL_NAME)
+    keys = [_text_key(text, model_name) for text in texts]
+
+    conn = _open_cache(cache_path or EMBEDDING_CACHE_PATH) if use_cache else None
+    try:
+        vectors = _load_cached(conn, set(keys)) if conn else {}
+        cached_count = sum(1 for key in keys if key in vectors)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            encoded = np.asarray(
+                model.encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+            for key, vector in zip(missing, encoded):
+                vectors[key] = vector
+            if conn:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                        [(key, len(vectors[key]), vectors[key].tobytes()) for key in missing],
+                    )
+            print(f"Embedded {len(texts)} texts ({len(missing)} encoded, {cached_count} from cache).")
+    finally:
+        if conn:
+            conn.close()
+
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([vectors[key] for key in keys])
+
+
+def embed_query(text):
+    """Embeds a single question (questions are short and rarely repeat, so they skip the disk cache)."""
+    return embed_texts([text], use_cache=False)[0]
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Content-addressed cache for extraction results (page text, OCR output, parsed LLM JSON).
+# Entries are keyed by the SHA-256 of the PDF bytes plus a version string, so a change to
+# the pipeline or the LLM model invalidates old entries without any manual cleanup.
+CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extraction"))
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# put_cached tracks the cache size itself and only scans the directory when the estimate goes
+# over the limit, or when the last scan is older than this (to pick up other processes' writes)
+EVICT_RESCAN_SECONDS = 60
+
+stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+_sizes = {} # cache_dir -> [estimated total bytes, time of the last directory scan]
+
+
+def file_sha256(file_path):
+    """Hashes the file bytes in 1 MB blocks so large PDFs never have to fit in memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _entry_path(kind, digest, version, cache_dir):
+    safe_version = hashlib.sha256(str(version).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{digest}-{kind}-{safe_version}.json")
+
+
+def get_cached(kind, digest, version, cache_dir=None):
+    """Returns the cached value, or None on a miss. A hit marks the entry as recently used."""
+    path = _entry_path(kind, digest, version, cache_dir or CACHE_DIR)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        with _lock:
+            stats["misses"] += 1
+        return None
+
+    try:
+        os.utime(path) # bump mtime, which is what LRU eviction orders by
+    except OSError:
+        pass # evicted by another process since the read; the value is still good
+    with _lock:
+        stats["hits"] += 1
+    return value
+
+
+def put_cached(kind, digest, version, value, cache_dir=None, max_bytes=None):
+    """Stores a JSON-serialisable value, then evicts least recently used entries over the size limit."""
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(kind, digest, version, cache_dir)
+
+    # Write to a temp file first so a concurrent reader never sees a half-written entry
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        known = _sizes.get(cache_dir)
+        scan_due = known is None or known[0] + size > max_bytes or time.time() - known[1] > EVICT_RESCAN_SECONDS
+        if not scan_due:
+            known[0] += size # an overwrite is counted twice, which only makes the next scan come sooner
+    if scan_due:
+        total = evict(cache_dir, max_bytes)
+        with _lock:
+            _sizes[cache_dir] = [total, time.time()]
+
+
+def evict(cache_dir, max_bytes):
+    """Deletes the least recently used entries until the cache fits in max_bytes; returns the size left."""
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        entries.append((info.st_mtime, info.st_size, path))
+        total += info.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+def cache_stats():
+    """Returns hit/miss counters and the hit rate for this process."""
+    with _lock:
+        hits, misses = stats["hits"], stats["misses"]
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import time
+
+# Bookkeeping for the shared vector collection. Documents are indexed once, keyed by the
+# SHA-256 of the uploaded file, and sessions hold references to them; a document's vectors
+# are only dropped when no session references it any more. Sessions that haven't been seen
+# for SESSION_TTL_SECONDS are released by garbage collection (Streamlit has no
+# "session ended" hook, so idle time is the only signal).
+INDEX_REGISTRY_PATH = os.getenv("INDEX_REGISTRY_PATH", os.path.join(".cache", "index_registry.sqlite3"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 24 * 60 * 60))
+
+
+def _connect(db_path=None):
+    db_path = db_path or INDEX_REGISTRY_PATH
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS documents (
+            doc_hash TEXT PRIMARY KEY,
+            chunk_count INTEGER NOT NULL,
+            indexed_at REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS session_documents (
+            session_id TEXT NOT NULL,
+            doc_hash TEXT NOT NULL,
+            doc_name TEXT,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (session_id, doc_hash)
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS session_documents_doc ON session_documents (doc_hash)")
+    return conn
+
+
+def is_indexed(doc_hash, db_path=None):
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT 1 FROM documents WHERE doc_hash = ?", (doc_hash,)).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def chunk_count(doc_hash, db_path=None):
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT chunk_count FROM documents WHERE doc_hash = ?", (doc_hash,)).fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def add_document(doc_hash, chunk_count, db_path=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO documents (doc_hash, chunk_count, indexed_at) VALUES (?, ?, ?)",
+            (doc_hash, chunk_count, time.time()),
+        )
+    finally:
+        conn.close()
+
+
+def attach(session_id, doc_hash, doc_name=None, db_path=None):
+    """Adds (or refreshes) a session's reference to a document."""
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO session_documents (session_id, doc_hash, doc_name, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id, doc_hash) DO UPDATE SET doc_name = excluded.doc_name, last_seen = excluded.last_seen",
+            (session_id, doc_hash, doc_name, time.time()),
+        )
+    finally:
+        conn.close()
+
+
+def touch(session_id, db_path=None):
+    """Marks every document of the session as recently used."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("UPDATE session_documents SET last_seen = ? WHERE session_id = ?", (time.time(), session_id))
+    finally:
+        conn.close()
+
+
+def refcount(doc_hash, db_path=None):
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM session_documents WHERE doc_hash = ?", (doc_hash,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def detach(session_id, doc_hash=None, db_path=None):
+    """Drops a session's reference to one document (or to all of its documents)."""
+    conn = _connect(db_path)
+    try:
+        if doc_hash is None:
+            conn.execute("DELETE FROM session_documents WHERE session_id = ?", (session_id,))
+        else:
+            conn.execute("DELETE FROM session_documents WHERE session_id = ? AND doc_hash = ?", (session_id, doc_hash))
+    finally:
+        conn.close()
+
+
+def expire_sessions(ttl=None, db_path=None):
+    """Drops the references of sessions idle for longer than ttl seconds. Returns how many were dropped."""
+    ttl = SESSION_TTL_SECONDS if ttl is None else ttl
+    conn = _connect(db_path)
+    try:
+        return conn.execute("DELETE FROM session_documents WHERE last_seen < ?", (time.time() - ttl,)).rowcount
+    finally:
+        conn.close()
+
+
+def unreferenced_documents(db_path=None):
+    """Hashes of indexed documents that no session references any more."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT doc_hash FROM documents WHERE doc_hash NOT IN (SELECT doc_hash FROM session_documents)"
+        ).fetchall()
+        return [row[0] for row in rows]
+    finally:
+        conn.close()
+
+
+def remove_if_unreferenced(doc_hash, db_path=None):
+    """
+    Drops a document's row in one transaction, but only if no session references it.
+    Returns its chunk count if it was removed, None if it is (again) in use or unknown.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT chunk_count FROM documents WHERE doc_hash = ?", (doc_hash,)).fetchone()
+        deleted = conn.execute(
+            "DELETE FROM documents WHERE doc_hash = ? AND NOT EXISTS "
+            "(SELECT 1 FROM session_documents WHERE session_documents.doc_hash = documents.doc_hash)",
+            (doc_hash,),
+        ).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return row[0] if deleted else None
+
+
+def clear(db_path=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute("DELETE FROM session_documents")
+        conn.execute("DELETE FROM documents")
+    finally:
+        conn.close()
@@ -0,0 +1,111 @@
+import math
+import os
+
+# Token-budgeted context for RAG prompts. Retrieved chunks are taken in ranking order while
+# they fit the budget; chunks that overlap (the chunker repeats a sentence or two) or sit next
+# to each other on the same page are merged into one block, and repeated boilerplate is
+# dropped. Blocks are emitted in document order with their page numbers.
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", 2000))
+# Rough token estimate for Gemini-style subword tokenizers: ~4 characters per token.
+# A local estimate keeps packing free; it errs on the generous side for legal English.
+CHARS_PER_TOKEN = 4
+# Chunks at most this many characters apart are merged (the gap is usually just whitespace)
+MERGE_GAP_CHARS = 2
+BLOCK_SEPARATOR = "\n\n---\n\n"
+
+
+def count_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalized(text):
+    return " ".join(text.lower().split())
+
+
+def _can_merge(block, chunk):
+    """Overlapping chunks always merge; touching ones only when they are on the same page."""
+    if chunk["char_start"] < block["char_end"]:
+        return True
+    return chunk["char_start"] <= block["char_end"] + MERGE_GAP_CHARS and chunk["page_start"] == block["page_end"]
+
+
+def merge_chunks(chunks):
+    """
+    Merges chunks whose character ranges overlap, or that are adjacent on the same page, into
+    blocks ({"text", "char_start", "char_end", "page_start", "page_end"}) in document order.
+    Chunks without offsets are kept as they are, after exact-duplicate removal.
+    """
+    blocks = []
+    seen = set()
+    located = []
+    for chunk in chunks:
+        key = _normalized(chunk["text"])
+        if key in seen:
+            continue
+        seen.add(key)
+        if "char_start" in chunk:
+            located.append(chunk)
+        else:
+            blocks.append({"text": chunk["text"], "char_start": None, "char_end": None,
+                           "page_start": chunk.get("page_start"), "page_end": chunk.get("page_end")})
+
+    merged = []
+    for chunk in sorted(located, key=lambda c: c["char_start"]):
+        block = merged[-1] if merged else None
+        if block is not None and _can_merge(block, chunk):
+            if chunk["char_end"] > block["char_end"]:
+                overlap = block["char_end"] - chunk["char_start"]
+                if overlap >= 0:
+                    block["text"] += chunk["text"][overlap:]
+                else:
+                    block["text"] += "\n" + chunk["text"]
+                block["char_end"] = chunk["char_end"]
+                block["page_end"] = max(block["page_end"], chunk["page_end"])
+        else:
+            merged.append({key: chunk[key] for key in ("text", "char_start", "char_end", "page_start", "page_end")})
+    return merged + blocks
+
+
+def format_block(block):
+    if block.get("page_start") is None:
+        return block["text"]
+    # Pages are numbered from 0 in the pipeline, from 1 for readers
+    first, last = block["page_start"] + 1, block["page_end"] + 1
+    label = f"[Page {first}]" if first == last else f"[Pages {first}-{last}]"
+    return f"{label}\n{block['text']}"
+
+
+def format_context(blocks):
+    return BLOCK_SEPARATOR.join(format_block(block) for block in blocks)
+
+
+def pack_context(chunks, token_budget):
+    """
+    Picks chunks in the given (ranking) order while the merged, formatted context stays within
+    token_budget, skipping any chunk that would overflow it. Returns the merged blocks.
+    The top-ranked chunk always comes first (cut to the budget if it doesn't fit on its own),
+    so the best match is never dropped in favour of lower-ranked ones.
+    """
+    if not chunks:
+        return []
+    top = chunks[0]
+    if count_tokens(format_context(merge_chunks([top]))) > token_budget:
+        top = _truncate(top, token_budget)
+    selected = [top]
+    blocks = merge_chunks(selected)
+    for chunk in chunks[1:]:
+        candidate = merge_chunks(selected + [chunk])
+        if count_tokens(format_context(candidate)) <= token_budget:
+            selected.append(chunk)
+            blocks = candidate
+    return blocks
+
+
+def _truncate(chunk, token_budget):
+    """The chunk cut so that its formatted block fits token_budget (its page label included)."""
+    label_tokens = count_tokens(format_context(merge_chunks([dict(chunk, text="")])))
+    chars = max(token_budget - label_tokens, 0) * CHARS_PER_TOKEN
+    truncated = dict(chunk, text=chunk["text"][:chars])
+    if "char_start" in chunk:
+        truncated["char_end"] = chunk["char_start"] + len(truncated["text"])
+    return truncated
@@ -1,16 +1,53 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import re
+import json
+from .llm_client import GeminiBackend, LLMGateway
+from .response_cache import ResponseCache, chunk_id
+from .context_builder import MAX_PROMPT_TOKENS, count_tokens, pack_context, format_context
+from src import model_registry
 
+# google-generativeai, the .env file and the retrieval stack (NumPy, SentenceTransformers) are
+# only loaded on first use, so importing this module is cheap.
+MODEL_NAME = "models/gemini-flash-latest"
 
-# This line loads the variables from your .env file
-load_dotenv()
 
-# This safely gets the key from the environment
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+def _load_gemini():
+    from dotenv import load_dotenv
+    import google.generativeai as genai
 
-model = genai.GenerativeModel("models/gemini-flash-latest")
+    # This line loads the variables from your .env file
+    load_dotenv()
+
+    # This safely gets the key from the environment
+    api_key = os.getenv("GOOGLE_API_KEY")
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+def _embed_question(question):
+    from src.embeddings import embed_query
+    return embed_query(question)
+
+
+model_registry.register("gemini", _load_gemini)
+_gateway = None
+# Answers for repeated (or reworded) questions on the same document skip the LLM call
+response_cache = ResponseCache(embed_fn=_embed_question)
+
+
+def get_gateway():
+    """Shared LLM gateway (concurrency cap, rate limit, retries) for every LLM call in this process."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(GeminiBackend(MODEL_NAME, model_loader=lambda: model_registry.get("gemini")))
+    return _gateway
+
+
+def set_llm_backend(backend, **gateway_options):
+    """Swaps the LLM backend, e.g. for llm_client.FakeBackend in offline tests."""
+    global _gateway
+    _gateway = LLMGateway(backend, **gateway_options)
+    return _gateway
 
 
 # --- STEP 1: DEFINE RESPONSIBILITY PRINCIPLES ---
@@ -23,10 +60,32 @@ RESPONSIBILITY_PRINCIPLES = [
 ]
 # -------------------------------------------------
 
+# Chunks retrieved per question; the context builder keeps as many as fit MAX_PROMPT_TOKENS.
+RAG_CANDIDATES = 8
+NO_CONTEXT_ANSWER = "I'm sorry, I couldn't find any relevant information in the document to answer that question."
 
+# Documents longer than this are extracted chunk by chunk (map) and merged (reduce).
+EXTRACTION_CHUNK_CHARS = 30000
 
-def extract_entities_with_llm(text):
-    full_prompt = f"""You are an expert legal assistant. From the document text provided, perform two tasks:
+ENTITY_FIELDS = [
+    "individual_names",
+    "dates",
+    "addresses_locations",
+    "phone_numbers",
+    "emails",
+    "company_names",
+    "organization_names",
+]
+
+# Lines that start a new clause/section: "1.", "12.3", "ARTICLE IV", "Section 5", "Clause 2", "SCHEDULE A"
+SECTION_BOUNDARY = re.compile(
+    r'^\s*(?:\d+(?:\.\d+)*[.)]\s|(?:article|section|clause|schedule|annexure)\b)',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def build_extraction_prompt(text):
+    return f"""You are an expert legal assistant. From the document text provided, perform two tasks:
     
     Task 1: Extract key entities.
     Task 2: Analyze and extract key clauses.
@@ -56,36 +115,114 @@ def extract_entities_with_llm(text):
     {text}
     ---
     """
-    response = model.generate_content(full_prompt)
-    return response.text
 
-def answer_user_questions(user_question, session_id, active_doc_name):
+
+def parse_llm_json(llm_output):
+    """Parses the LLM's JSON answer, also accepting a ```json fenced block. Returns None if it isn't valid JSON."""
+    try:
+        return json.loads(llm_output)
+    except json.JSONDecodeError:
+        match = re.search(r'```(json)?\s*(\{.*\}|\[.*\])\s*```', llm_output, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(2))
+            except json.JSONDecodeError:
+                return None
+    return None
+
+
+def split_into_sections(text, max_chars=EXTRACTION_CHUNK_CHARS):
     """
-    --- THIS IS THE UPDATED RAG FUNCTION ---
-    It now returns (answer, context) or (error_message, None)
+    Splits text into chunks of at most max_chars, cutting on clause/section boundaries
+    so a clause is not split across two prompts. A single section longer than max_chars
+    is cut on paragraph breaks (or hard-cut as a last resort).
     """
-    print(f"Answering RAG question: {user_question}")
-    
-    # 1. Retrieve relevant chunks from Cosdata
-    retrieved_chunks = query_cosdata(user_question, session_id, active_doc_name, top_k=5)
-    
-    # # --- DEBUG LINE ---
-    # print("\n--- DEBUG: TOP 5 RETRIEVED CHUNKS ---")
-    # for i, chunk in enumerate(retrieved_chunks):
-    #     print(f"CHUNK {i+1}: {chunk[:150]}...") 
-    # print("--- END DEBUG ---\n")
-    # # ------------------------
-    
-    if not retrieved_chunks:
-        # This now correctly returns two values (a string and None)
-        return "I'm sorry, I couldn't find any relevant information in the document to answer that question.", None
-    
-    # 2. Combine chunks into a context string
-    context = "\n\n---\n\n".join(retrieved_chunks)
+    starts = [m.start() for m in SECTION_BOUNDARY.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
 
-    # 3. Build a new prompt for the LLM
+    chunks = []
+    current = ""
+    for section in sections:
+        while len(section) > max_chars:
+            cut = section.rfind("\n\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(section[:cut])
+            section = section[cut:]
+        if current and len(current) + len(section) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def merge_extractions(results):
+    """Reduce step: unions entities and clauses from per-chunk results, dropping duplicates."""
+    entities = {field: [] for field in ENTITY_FIELDS}
+    seen_entities = {field: set() for field in ENTITY_FIELDS}
+    clauses = []
+    seen_clauses = set()
+
+    for result in results:
+        for field, values in (result.get("entities") or {}).items():
+            if not isinstance(values, list):
+                values = [values] if values else []
+            entities.setdefault(field, [])
+            seen = seen_entities.setdefault(field, set())
+            for value in values:
+                key = " ".join(str(value).lower().split())
+                if key and key not in seen:
+                    seen.add(key)
+                    entities[field].append(value)
+
+        for clause in result.get("clauses") or []:
+            key = " ".join(str(clause.get("clause_text") or clause.get("clause_title", "")).lower().split())
+            if key not in seen_clauses:
+                seen_clauses.add(key)
+                clauses.append(clause)
+
+    return {"entities": entities, "clauses": clauses}
+
+
+def extract_entities_with_llm(text):
+    """
+    Returns (llm_output, failed_chunks): the LLM's raw JSON string with "entities" and "clauses",
+    and how many chunks could not be extracted.
+    Long documents are split on section boundaries, the chunks are extracted
+    concurrently and the per-chunk JSON is merged back into the same schema.
+    Raises RuntimeError when no chunk could be extracted at all.
+    """
+    gateway = get_gateway()
+    if len(text) <= EXTRACTION_CHUNK_CHARS:
+        return gateway.generate_sync(build_extraction_prompt(text)), 0
+
+    chunks = split_into_sections(text, EXTRACTION_CHUNK_CHARS)
+    print(f"Extracting entities from {len(chunks)} chunks...")
+    outputs = gateway.generate_many_sync([build_extraction_prompt(chunk) for chunk in chunks])
+
+    results = []
+    for i, output in enumerate(outputs):
+        if isinstance(output, Exception):
+            print(f"Chunk {i + 1}: LLM call failed ({output}), skipping.")
+            continue
+        data = parse_llm_json(output)
+        if isinstance(data, dict):
+            results.append(data)
+        else:
+            print(f"Chunk {i + 1}: could not parse LLM output, skipping.")
+    if not results:
+        raise RuntimeError(f"Entity extraction failed for all {len(chunks)} chunks of the document.")
+    return json.dumps(merge_extractions(results)), len(chunks) - len(results)
+
+def build_answer_prompt(user_question, context):
     # --- THIS PROMPT IS NOW FINE-TUNED (STRATEGY 2) ---
-    prompt = f"""You are an expert legal Q&A assistant. Your task is to answer the user's question based *only* on the context snippets provided below.
+    return f"""You are an expert legal Q&A assistant. Your task is to answer the user's question based *only* on the context snippets provided below.
 
     Follow these rules:
     1.  **Factual Questions (e.g., "What", "When", "How"):** Answer the question directly using facts from the context.
@@ -109,10 +246,78 @@ def answer_user_questions(user_question, session_id, active_doc_name):
     Based *only* on the context snippets and rules above, answer the following question:
     USER QUESTION: {user_question}
     ANSWER: """
+
+def _prepare_answer(user_question, session_id, active_doc_name, doc_hash, max_prompt_tokens):
+    """Retrieval + context packing. Returns (prompt, cache_key, ready_answer); ready_answer is set when no LLM call is needed."""
+    from src.cosdata_store import search_chunks
+    print(f"Answering RAG question: {user_question}")
+    
+    # 1. Retrieve candidate chunks (more than fit; the packer keeps the best that do)
+    retrieved_chunks = search_chunks(user_question, session_id, doc_hash, top_k=RAG_CANDIDATES) if doc_hash else []
     
+    if not retrieved_chunks:
+        return None, None, NO_CONTEXT_ANSWER
+
+    # 2. Pack the highest-ranked chunks into the token budget left after the rules and question
+    max_prompt_tokens = max_prompt_tokens or MAX_PROMPT_TOKENS
+    context_budget = max_prompt_tokens - count_tokens(build_answer_prompt(user_question, ""))
+    blocks = pack_context(retrieved_chunks, context_budget)
+    context = format_context(blocks)
+
+    chunk_ids = [chunk_id(block["text"]) for block in blocks]
+    cache_key = (doc_hash or active_doc_name, user_question, chunk_ids)
+    cached_answer = response_cache.get(*cache_key)
+    if cached_answer is not None:
+        print(f"Response cache HIT (hit rate {response_cache.hit_rate():.0%}).")
+        return None, cache_key, cached_answer
+
+    # 3. Build a new prompt for the LLM
+    prompt = build_answer_prompt(user_question, context)
+    print(f"Prompt: ~{count_tokens(prompt)} tokens, {len(blocks)} context blocks from {len(retrieved_chunks)} chunks.")
+    return prompt, cache_key, None
+
+def answer_user_questions(user_question, session_id, active_doc_name, doc_hash=None, max_prompt_tokens=None):
+    """
+    --- THIS IS THE UPDATED RAG FUNCTION ---
+    It now returns (answer, context) or (error_message, None)
+    doc_hash (the uploaded file's SHA-256) selects the document in the shared index
+    and keys the shared response cache. The prompt is kept within max_prompt_tokens
+    (MAX_PROMPT_TOKENS by default) by packing only as much retrieved context as fits.
+    """
+    prompt, cache_key, ready_answer = _prepare_answer(user_question, session_id, active_doc_name, doc_hash, max_prompt_tokens)
+    if ready_answer == NO_CONTEXT_ANSWER:
+        # This now correctly returns two values (a string and None)
+        return ready_answer, None
+    if ready_answer is not None:
+        return ready_answer
+    
+    try:
+        answer = get_gateway().generate_sync(prompt)
+        response_cache.put(*cache_key, answer)
+        return answer
+    except Exception as e:
+        print(f"Error during LLM generation: {e}")
+        return f"Sorry, an error occurred while generating the answer: {e}"
+
+def stream_user_answer(user_question, session_id, active_doc_name, doc_hash=None, max_prompt_tokens=None):
+    """
+    Streaming version of answer_user_questions: yields the answer as text deltas as the LLM
+    produces them (a cached answer comes as a single delta). The complete answer is cached
+    once the stream finishes.
+    """
+    prompt, cache_key, ready_answer = _prepare_answer(user_question, session_id, active_doc_name, doc_hash, max_prompt_tokens)
+    if ready_answer is not None:
+        yield ready_answer
+        return
+
+    parts = []
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        for delta in get_gateway().stream_sync(prompt):
+            parts.append(delta)
+            yield delta
     except Exception as e:
         print(f"Error during LLM generation: {e}")
-        return f"Sorry, an error occurred while generating the answer: {e}"
\ No newline at end of file
+        separator = "\n\n" if parts else "" # the stream may have broken off mid-answer
+        yield f"{separator}Sorry, an error occurred while generating the answer: {e}"
+        return
+    response_cache.put(*cache_key, "".join(parts))
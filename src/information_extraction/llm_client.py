@@ -0,0 +1,268 @@
+import asyncio
+import queue
+import re
+import threading
+import time
+
+# Async gateway in front of the LLM. Every call goes through one event loop per process,
+# so the concurrency cap, rate limit and in-flight coalescing apply across all Streamlit
+# sessions, not just within a single request.
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+def is_retryable(error):
+    """
+    Timeouts, rate limits (429) and server errors (5xx) are worth retrying; anything else
+    (a bad request, an invalid key, a blocked prompt) would just fail again.
+    google.api_core errors carry the HTTP status as `code`, other clients as `status_code`.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+class SimulatedFailure(RuntimeError):
+    """Error raised by FakeBackend, with the HTTP status a real API would have answered."""
+
+    def __init__(self, status_code):
+        super().__init__(f"FakeBackend: simulated {status_code} failure")
+        self.status_code = status_code
+
+
+class GeminiBackend:
+    """
+    Calls Gemini through google-generativeai's async API. model_loader, if given,
+    returns the GenerativeModel to use (e.g. a shared instance from the model registry).
+    """
+
+    def __init__(self, model_name, model_loader=None):
+        self.model_name = model_name
+        self.model_loader = model_loader
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            if self.model_loader is not None:
+                self._model = self.model_loader()
+            else:
+                import google.generativeai as genai
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def generate(self, prompt):
+        response = await self._get_model().generate_content_async(prompt)
+        return response.text
+
+    async def generate_stream(self, prompt):
+        """Yields the response text piece by piece as Gemini produces it."""
+        response = await self._get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.parts: # a chunk can carry only metadata (e.g. the finish reason)
+                yield chunk.text
+
+
+class FakeBackend:
+    """
+    Offline backend for tests. Answers with handler(prompt) (or a fixed reply),
+    optionally after a delay, and can fail the first `failures` calls with failure_status.
+    """
+
+    def __init__(self, reply="", handler=None, delay=0.0, failures=0, failure_status=503):
+        self.reply = reply
+        self.handler = handler
+        self.delay = delay
+        self.failures = failures
+        self.failure_status = failure_status
+        self.calls = []
+
+    async def generate(self, prompt):
+        self.calls.append(prompt)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise SimulatedFailure(self.failure_status)
+        return self.handler(prompt) if self.handler else self.reply
+
+    async def generate_stream(self, prompt):
+        """Streams the reply word by word (with delay between words)."""
+        self.calls.append(prompt)
+        if self.failures > 0:
+            self.failures -= 1
+            raise SimulatedFailure(self.failure_status)
+        reply = self.handler(prompt) if self.handler else self.reply
+        for word in re.findall(r"\S+\s*", reply):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMGateway:
+    """
+    Bounded, rate-limited LLM client with timeouts, exponential backoff (for is_retryable errors) and coalescing
+    of identical in-flight prompts. Use `await generate(...)` / `stream(...)` from async code or
+    `generate_sync(...)` / `generate_many_sync(...)` / `stream_sync(...)` from regular code.
+    """
+
+    def __init__(self, backend, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, timeout=DEFAULT_TIMEOUT_SECONDS,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "failures": 0}
+        self._semaphore = None
+        self._in_flight = {}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    async def generate(self, prompt):
+        """Returns the model's text for prompt. Identical prompts already in flight share one call."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        task = self._in_flight.get(prompt)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._generate_with_retries(prompt))
+        self._in_flight[prompt] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(prompt, None))
+        return await asyncio.shield(task)
+
+    async def _generate_with_retries(self, prompt):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    await self.bucket.acquire()
+                    self.stats["requests"] += 1
+                    return await asyncio.wait_for(self.backend.generate(prompt), self.timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+                print(f"LLM call failed ({e!r}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def stream(self, prompt):
+        """
+        Yields the model's text deltas for prompt, within the same concurrency and rate limits.
+        Retryable failures are retried only until the first delta arrives; after that they are raised.
+        Backends without generate_stream yield their whole answer as one delta.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if not hasattr(self.backend, "generate_stream"):
+            yield await self.generate(prompt)
+            return
+
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._semaphore:
+                    await self.bucket.acquire()
+                    self.stats["requests"] += 1
+                    deltas = self.backend.generate_stream(prompt).__aiter__()
+                    while True:
+                        try:
+                            delta = await asyncio.wait_for(deltas.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        yield delta
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+                print(f"LLM stream failed ({e!r}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def generate_many(self, prompts):
+        """Runs prompts concurrently (within the gateway limits). Failed prompts come back as exceptions."""
+        return await asyncio.gather(*(self.generate(prompt) for prompt in prompts), return_exceptions=True)
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True).start()
+            return self._loop
+
+    def run_sync(self, coro):
+        """Runs a coroutine on the gateway's background event loop and blocks for the result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def generate_sync(self, prompt):
+        return self.run_sync(self.generate(prompt))
+
+    def generate_many_sync(self, prompts):
+        return self.run_sync(self.generate_many(prompts))
+
+    def stream_sync(self, prompt):
+        """Blocking generator over stream(prompt): yields each delta as soon as the background loop receives it."""
+        deltas = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for delta in self.stream(prompt):
+                    deltas.put(delta)
+            except Exception as e:
+                deltas.put(e)
+            finally:
+                deltas.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._get_loop())
+        try:
+            while True:
+                item = deltas.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel() # stops the LLM call if the caller stopped reading early
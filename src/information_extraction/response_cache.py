@@ -0,0 +1,102 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Cache of RAG answers, keyed by (document hash, normalized question, retrieved chunk IDs).
+# With an embed_fn, a question that is only worded differently (e.g. "who are the parties?"
+# vs "who are the parties to this agreement") can reuse an answer for the same document and
+# the same retrieved chunks.
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+
+def normalize_question(question):
+    """Lowercases, drops punctuation and collapses whitespace."""
+    return " ".join(re.sub(r"[^\w\s/]", " ", question.lower()).split())
+
+
+def chunk_id(chunk_text):
+    return hashlib.sha1(chunk_text.encode("utf-8")).hexdigest()[:16]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL answer cache with hit-rate metrics."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 embed_fn=None, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+        self._entries = OrderedDict() # key -> (answer, question_vector, stored_at)
+        self._lock = threading.Lock()
+
+    def _key(self, doc_hash, question, chunk_ids):
+        return (doc_hash, normalize_question(question), tuple(sorted(chunk_ids)))
+
+    def _embed(self, question):
+        return self.embed_fn(normalize_question(question)) if self.embed_fn else None
+
+    def get(self, doc_hash, question, chunk_ids):
+        """Returns a cached answer or None."""
+        key = self._key(doc_hash, question, chunk_ids)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            if self.embed_fn is None:
+                self.stats["misses"] += 1
+                return None
+
+        # Near-duplicate lookup: same document and retrieved chunks, similar question
+        vector = self._embed(question)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for other_key, (_, other_vector, _) in self._entries.items():
+                if other_key[0] != key[0] or other_key[2] != key[2] or other_vector is None:
+                    continue
+                score = _cosine(vector, other_vector)
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return self._entries[best_key][0]
+
+    def put(self, doc_hash, question, chunk_ids, answer):
+        key = self._key(doc_hash, question, chunk_ids)
+        vector = self._embed(question)
+        with self._lock:
+            self._entries[key] = (answer, vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now):
+        # Entries are in LRU order, not insertion order, so check them all
+        expired = [key for key, (_, _, stored_at) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def hit_rate(self):
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
@@ -0,0 +1,270 @@
+import atexit
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Local job queue backed by SQLite. The Streamlit app submits analysis jobs and polls them by ID;
+# worker processes claim queued jobs, report progress per stage and store the result. Because
+# everything lives in the database, a reload (or a new browser tab) can resume by job ID.
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(".cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+POLL_INTERVAL_SECONDS = 0.5
+# OCR processes per job; the workers share the machine's cores between them
+JOB_OCR_WORKERS = int(os.getenv("JOB_OCR_WORKERS", max((os.cpu_count() or 1) // max(JOB_WORKERS, 1), 1)))
+# Running jobs bump updated_at every HEARTBEAT_SECONDS, even inside a long stage (OCR, LLM calls).
+# A running job is put back in the queue when its worker process is gone, or when it has
+# missed heartbeats for STALE_JOB_SECONDS (e.g. the worker is frozen).
+HEARTBEAT_SECONDS = 30
+STALE_JOB_SECONDS = 5 * 60
+# A job whose worker died this many times (e.g. OOM or a crash inside OCR) is failed, not requeued
+MAX_JOB_ATTEMPTS = 3
+
+_workers = []
+
+
+def _connect(db_path=None):
+    db_path = db_path or JOB_DB_PATH
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            worker_pid INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    if "attempts" not in [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]:
+        conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0") # databases from before attempts
+    return conn
+
+
+def submit_job(kind, payload, db_path=None):
+    """Queues a job and returns its ID."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, stage, payload, created_at, updated_at) VALUES (?, ?, 'queued', 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now),
+        )
+    finally:
+        conn.close()
+    return job_id
+
+
+def get_job(job_id, db_path=None):
+    """Returns the job as a dict (payload/result decoded), or None if the ID is unknown."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def claim_next_job(db_path=None):
+    """Atomically moves the oldest queued job to 'running' and returns it, or None if the queue is empty."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker_pid = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (os.getpid(), time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return get_job(row["id"], db_path)
+
+
+def update_progress(job_id, stage, progress, db_path=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+            (stage, progress, time.time(), job_id),
+        )
+    finally:
+        conn.close()
+
+
+def _finish(job_id, status, result=None, error=None, db_path=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, stage = ?, progress = CASE WHEN ? = 'done' THEN 1.0 ELSE progress END, "
+            "result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, status, status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+    finally:
+        conn.close()
+
+
+def heartbeat(job_id, db_path=None):
+    """Marks a running job as still alive without changing its stage or progress."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+    finally:
+        conn.close()
+
+
+def _pid_alive(pid):
+    if pid is None or pid == os.getpid():
+        return False # a job can't be running in the process that is checking it
+    if os.name == "nt":
+        return True # no cheap liveness probe there; rely on the heartbeat alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # exists, but belongs to another user
+    return True
+
+
+def requeue_stale_jobs(max_age=STALE_JOB_SECONDS, db_path=None):
+    """
+    Puts 'running' jobs back in the queue when their worker process no longer exists or
+    they have missed heartbeats for max_age seconds; a job that has already been claimed
+    MAX_JOB_ATTEMPTS times is marked failed instead. Returns how many were requeued.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("SELECT id, worker_pid, attempts, updated_at FROM jobs WHERE status = 'running'").fetchall()
+        cutoff = time.time() - max_age
+        stale = [row for row in rows if row["updated_at"] < cutoff or not _pid_alive(row["worker_pid"])]
+        requeued = failed = 0
+        for row in stale:
+            if row["attempts"] >= MAX_JOB_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', stage = 'failed', worker_pid = NULL, error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (f"The worker stopped while running this job {row['attempts']} times; giving up.", time.time(), row["id"]),
+                )
+                failed += 1
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', stage = 'queued', worker_pid = NULL WHERE id = ?", (row["id"],)
+                )
+                requeued += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    if requeued or failed:
+        print(f"Requeued {requeued} stale job(s), failed {failed} after {MAX_JOB_ATTEMPTS} attempts.")
+    return requeued
+
+
+def run_job(job, db_path=None):
+    """Runs one claimed job with its handler and records the result or the error."""
+    handler = JOB_HANDLERS[job["kind"]]
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            heartbeat(job["id"], db_path)
+
+    beater = threading.Thread(target=beat, name=f"heartbeat-{job['id']}", daemon=True)
+    beater.start()
+    try:
+        result = handler(job["payload"], lambda stage, progress: update_progress(job["id"], stage, progress, db_path))
+    except Exception as e:
+        print(f"Job {job['id']} failed: {e}")
+        _finish(job["id"], "failed", error=str(e), db_path=db_path)
+        return
+    finally:
+        stop.set()
+        beater.join()
+    _finish(job["id"], "done", result=result, db_path=db_path)
+
+
+def run_worker(db_path=None, poll_interval=POLL_INTERVAL_SECONDS, max_jobs=None):
+    """Worker loop: claims and runs jobs until max_jobs have run (forever by default)."""
+    requeue_stale_jobs(db_path=db_path)
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = claim_next_job(db_path)
+        if job is None:
+            # Idle: pick up jobs left behind by workers that died since
+            if requeue_stale_jobs(db_path=db_path) == 0:
+                time.sleep(poll_interval)
+            continue
+        run_job(job, db_path)
+        done += 1
+
+
+def start_workers(count=None, db_path=None):
+    """Starts the worker processes once per process; later calls are no-ops while they are alive."""
+    global _workers
+    _workers = [worker for worker in _workers if worker.is_alive()]
+    count = JOB_WORKERS if count is None else count
+    # spawn, not fork: the parent (Streamlit) runs threads that must not be copied mid-state.
+    # Not daemonic, so a worker can run its own OCR process pool; stop_workers ends them instead.
+    context = multiprocessing.get_context("spawn")
+    while len(_workers) < count:
+        worker = context.Process(target=run_worker, args=(db_path,), name="analysis-worker")
+        worker.start()
+        _workers.append(worker)
+    # Registered once the workers are started, i.e. after multiprocessing's own exit hook, so it
+    # runs first (atexit is LIFO) and stops them before multiprocessing waits for its children
+    atexit.unregister(stop_workers)
+    atexit.register(stop_workers)
+    return _workers
+
+
+def stop_workers(timeout=5):
+    """Terminates the worker processes (registered with atexit by start_workers). Their running jobs are requeued later."""
+    global _workers
+    for worker in _workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers = []
+
+
+def _analyze_document_job(payload, progress):
+    from src.analysis import analyze_document
+    return analyze_document(payload["file_path"], payload["session_id"], payload["doc_name"], progress,
+                            ocr_workers=JOB_OCR_WORKERS)
+
+
+JOB_HANDLERS = {
+    "analyze_document": _analyze_document_job,
+}
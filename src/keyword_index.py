@@ -0,0 +1,143 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# In-process BM25 index, one per indexed document, kept next to the vectors. Dense search
+# misses exact tokens users type verbatim (section numbers like "u/s 420", party names,
+# defined terms); keyword hits are fused with the dense ranking by reciprocal rank fusion.
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", os.path.join(".cache", "keyword_index"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60 # the usual RRF damping constant; larger values flatten the rank differences
+# Loaded indexes kept in memory, least recently used dropped first (they are re-read from disk)
+KEYWORD_INDEX_CACHE_SIZE = int(os.getenv("KEYWORD_INDEX_CACHE_SIZE", 32))
+
+# Words, numbers and joined tokens such as "u/s", "138", "12.3", "non-compete"
+TOKEN = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were will with "
+    "what which who whom when where why how does do did shall i my me".split()
+)
+
+_cache = OrderedDict() # index path -> (index, metadatas), most recently used last
+_cache_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of chunks: an inverted index of term -> {chunk id: term frequency}."""
+
+    def __init__(self, ids=(), texts=(), k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = {}
+        for chunk_id, text in zip(ids, texts):
+            self.add(chunk_id, text)
+
+    def add(self, chunk_id, text):
+        tokens = tokenize(text)
+        self.lengths[chunk_id] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+
+    def search(self, query, top_k=5):
+        """Returns [(chunk_id, score)] for chunks containing at least one query term, best first."""
+        n = len(self.lengths)
+        if n == 0:
+            return []
+        avg_length = sum(self.lengths.values()) / n or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def to_dict(self):
+        return {"k1": self.k1, "b": self.b, "postings": self.postings, "lengths": self.lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings = data["postings"]
+        index.lengths = data["lengths"]
+        return index
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=RRF_K):
+    """
+    Fuses ranked id lists: score(id) = sum(weight / (k + rank)) over the lists it appears in.
+    Returns the ids sorted by fused score, best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _index_path(key, index_dir):
+    return os.path.join(index_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def _remember(path, entry):
+    with _cache_lock:
+        _cache[path] = entry
+        _cache.move_to_end(path)
+        while len(_cache) > KEYWORD_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def save_index(key, index, metadatas, index_dir=None):
+    """Persists a document's BM25 index with the metadata of its chunks (so keyword-only hits have their text)."""
+    index_dir = index_dir or KEYWORD_INDEX_DIR
+    os.makedirs(index_dir, exist_ok=True)
+    path = _index_path(key, index_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index": index.to_dict(), "metadatas": metadatas}, f)
+    os.replace(tmp_path, path)
+    _remember(path, (index, metadatas))
+
+
+def load_index(key, index_dir=None):
+    """Returns (index, metadatas by chunk id) for a document, or (None, {}) if it has no keyword index."""
+    path = _index_path(key, index_dir or KEYWORD_INDEX_DIR)
+    with _cache_lock:
+        entry = _cache.get(path)
+        if entry is not None:
+            _cache.move_to_end(path)
+            return entry
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    entry = (BM25Index.from_dict(saved["index"]), saved["metadatas"])
+    _remember(path, entry)
+    return entry
+
+
+def delete_index(key=None, index_dir=None):
+    """Removes one document's keyword index, or all of them when key is None."""
+    index_dir = index_dir or KEYWORD_INDEX_DIR
+    paths = [_index_path(key, index_dir)] if key is not None else [
+        os.path.join(index_dir, name) for name in (os.listdir(index_dir) if os.path.isdir(index_dir) else [])
+    ]
+    for path in paths:
+        with _cache_lock:
+            _cache.pop(path, None)
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,24 +1,55 @@
 import os
 import re
+import threading
 from src.pipeline import process_pdf_for_text
-_classifier = None
-_judge_model = None
+from src import onnx_backend
+from src import model_registry
+
+CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+JUDGE_MODEL = "google/flan-t5-base"
+
+def _load_pytorch_classifier():
+    # Load the zero-shot classification model
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model=CLASSIFIER_MODEL)
+
+def _load_pytorch_judge():
+    # Load the text generation model
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=JUDGE_MODEL)
+
+def _load_classifier():
+    if onnx_backend.GATEKEEPER_BACKEND == "onnx":
+        try:
+            return onnx_backend.load_onnx_classifier(CLASSIFIER_MODEL)
+        except Exception as e:
+            print(f"ONNX classifier unavailable ({e}), falling back to PyTorch.")
+    return _load_pytorch_classifier()
+
+def _load_judge():
+    if onnx_backend.GATEKEEPER_BACKEND == "onnx":
+        try:
+            return onnx_backend.load_onnx_judge(JUDGE_MODEL)
+        except Exception as e:
+            print(f"ONNX judge unavailable ({e}), falling back to PyTorch.")
+    return _load_pytorch_judge()
+
+model_registry.register(
+    "gatekeeper_classifier",
+    _load_classifier,
+    warmup=lambda classifier: classifier("This agreement is made between the parties.", ["a contract", "an invoice"]),
+)
+model_registry.register(
+    "gatekeeper_judge",
+    _load_judge,
+    warmup=lambda judge: judge("Is this a legal document? Answer yes or no:"),
+)
 
 def get_classifier():
-    global _classifier
-    if _classifier is None:
-        # Load the zero-shot classification model
-        from transformers import pipeline
-        _classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-    return _classifier
+    return model_registry.get("gatekeeper_classifier")
 
 def get_judge_model():
-    global _judge_model
-    if _judge_model is None:
-        # Load the text generation model
-        from transformers import pipeline
-        _judge_model = pipeline("text2text-generation", model="google/flan-t5-base")
-    return _judge_model
+    return model_registry.get("gatekeeper_judge")
 
 negative_patterns = {
     "resume_cv": r'\b(curriculum vitae|references available|linkedin\.com/in/|github\.com/|career objective|extracurricular activities|gpa|cgpa|cumulative grade|bachelor of|master of|seeking a position|internship at)\b',
@@ -32,28 +63,9 @@ negative_patterns = {
     "general_article": r"\b(celebrity gossip|you won't believe|clickbait|sponsored post|buy now|limited time offer|leave a reply|read more|subscribe now|share this article|views expressed)\b",
 }
 
-def is_negative_pattern(text):
-    hits={}
-    for name, pat in negative_patterns.items():
-        matches = len(re.findall(pat, text, re.IGNORECASE))
-        if matches: 
-            hits[name] = matches
-    total_matches = sum(hits.values())
-    dominant_hits = max(hits.values(), default=0)
-    
-    return total_matches, dominant_hits
-
-def verify_document(input_data):
-    if os.path.exists(input_data) and input_data.lower().endswith(".pdf"):
-        print(f"Processing file: {input_data}")
-        full_text = process_pdf_for_text(input_data)
-    else:
-        full_text = input_data
-
-    text_preview = full_text[:2000]
-    
-    strong_signals = [
-        # --- 1. CONTRACTS & AGREEMENTS (Your existing list + refinements) ---
+STRONG_SIGNALS = {
+    # --- 1. CONTRACTS & AGREEMENTS (Your existing list + refinements) ---
+    "contracts_agreements": [
         r"\bhereinafter\b",
         r"\bwitnesseth\b",
         r"in\s+witness\s+whereof",
@@ -67,11 +79,13 @@ def verify_document(input_data):
         r"\bin\s+consideration\s+of\b",
         r"\bpursuant\s+to\b",
         r'\bTHIS\s+AGREEMENT\s+(is\s+entered|made|dated|shall)',
-        r'\bTHIS\s+[A-Z\s]+AGREEMENT\b',   
-        r'^AGREEMENT\s*\n',                
+        r'\bTHIS\s+[A-Z\s]+AGREEMENT\b',
+        r'^AGREEMENT\s*\n',
         r'AGREEMENT\s+between\s+.+and\s+',
-        
-        # --- 2. COURT SUMMONS, FINDINGS & LITIGATION ---
+    ],
+
+    # --- 2. COURT SUMMONS, FINDINGS & LITIGATION ---
+    "court_litigation": [
         r"\b(plaintiff|defendant|petitioner|respondent)\b",
         r"\b(in\s+the\s+court\s+of|high\s+court|supreme\s+court|district\s+court)\b",
         r"\b(writ\s+petition|civil\s+appeal|criminal\s+appeal)\b",
@@ -79,106 +93,199 @@ def verify_document(input_data):
         r"\b(cause\s+title|order\s+dated|judgment|decree)\b",
         r"\bsummons\s+to\b",
         r"\b(learned\s+counsel|amicus\s+curiae|stare\s+decisis)\b",
+    ],
 
-        # --- 3. POLICE COMPLAINTS & FIRs ---
+    # --- 3. POLICE COMPLAINTS & FIRs ---
+    "police_fir": [
         r"\b(first\s+information\s+report|fir\s+no\.?)\b",
         r"\b(police\s+station|p\.?s\.?)\b",
         r"\b(complainant|accused|informant)\b",
         r"\bunder\s+section\s+\d+[a-z]?\b", # e.g., "under section 420"
         r"\bu/?s\s+\d+[a-z]?\b",            # shorthand "u/s 420"
         r"\b(ipc|crpc|penal\s+code)\b",
+    ],
 
-        # --- 4. LEGAL NOTICES & DISPUTE EMAILS ---
+    # --- 4. LEGAL NOTICES & DISPUTE EMAILS ---
+    "legal_notices": [
         r"\b(legal\s+notice|demand\s+letter|cease\s+and\s+desist)\b",
         r"\bwithout\s+prejudice\b",
         r"\b(cause\s+of\s+action|institute\s+legal\s+proceedings)\b",
         r"\bstipulated\s+time\b",
         r"\b(attorney-client\s+privilege|privileged\s+and\s+confidential)\b",
         r"\bbreach\s+of\s+trust\b",
+    ],
 
-        # --- 5. PROPERTY & CIVIL RECORDS ---
+    # --- 5. PROPERTY & CIVIL RECORDS ---
+    "property_records": [
         r"\b(sale\s+deed|title\s+deed|conveyance\s+deed|lease\s+deed)\b",
         r"\b(encumbrance|stamp\s+duty|registration\s+act)\b",
         r"\b(schedule\s+of\s+property|bounded\s+on\s+the)\b",
         r"\b(khasra|khatauni|khatiyan|patta)\b", # Regional land record terms
-        
-        # --- 6. WILLS & FAMILY LEGAL DOCS ---
+    ],
+
+    # --- 6. WILLS & FAMILY LEGAL DOCS ---
+    "wills_family": [
         r"\b(last\s+will\s+and\s+testament|testator|testatrix)\b",
         r"\b(bequeath|probate|executor\s+of)\b",
         r"\b(of\s+sound\s+mind|legal\s+heirs)\b",
+    ],
 
-        # --- 7. TEXTBOOKS & ARTICLES ---
-        r"\b(jurisprudence|ratio\s+decidendi|fundamental\s+rights|tort\s+law)\b"
-    ]
-    
-    signal_score = 0
-    
-    for signal in strong_signals:
-        if re.search(signal, text_preview, re.IGNORECASE):
-            signal_score = min(signal_score + 0.1, 0.4)
-            
-    labels = [
-        # ACCEPT
-        "a legal contract, binding agreement, or personal legal document like a will",
-        "a police complaint, FIR, court summons, or judicial court finding",
-        "a legal notice, demand letter, or legal email correspondence",
-        "a property deed, civil record, or land registry document",
-        "a legal textbook, law article, or educational legal blog post",
-        
-        # REJECT
-        "a resume, curriculum vitae, or professional profile",
-        "a financial invoice, bill, receipt, or payment document",
-        "a news article, blog post, or general informational content",
-        "a business email, personal letter, memo, or meeting minutes, a personal friendly email",
-    ]
-    
-    ACCEPT_LABELS = [
-        "a legal contract, binding agreement, or personal legal document like a will",
-        "a police complaint, FIR, court summons, or judicial court finding",
-        "a legal notice, demand letter, or legal email correspondence",
-        "a property deed, civil record, or land registry document",
-        "a legal textbook, law article, or educational legal blog post",
-    ]
-    
-    classifier = get_classifier()
-    result = classifier(
-        text_preview, 
-        labels, 
-        hypothesis_template="This document is a {}."
-    )
-    
-    top_label = result['labels'][0]
-    top_score = result['scores'][0] * 0.6
-    
+    # --- 7. TEXTBOOKS & ARTICLES ---
+    "textbooks_articles": [
+        r"\b(jurisprudence|ratio\s+decidendi|fundamental\s+rights|tort\s+law)\b",
+    ],
+}
 
-    total_score = signal_score + top_score
-    
-    # debugging
-    # print(f"[DEBUG] signal={signal_score:.2f} | zsc={top_score:.2f} | total={total_score:.2f} | label={top_label}")
-    
-    return total_score, top_label, full_text, ACCEPT_LABELS
-    
-    
-    
-def is_legal_document(input_data):
-    score, top_label, text, ACCEPT_LABELS = verify_document(input_data)
-    total_matches, dominant_hits = is_negative_pattern(text)
-    
-    if total_matches >= 4 or dominant_hits >= 3:
-        return False, "Rejected: Too many negative patterns." 
-    
-    if(score >= 0.6 and top_label not in ACCEPT_LABELS):
-        return False, f"Rejected: Identified as {top_label} (Score: {score:.2f})"
-    
-    if(score >= 0.7 and top_label in ACCEPT_LABELS):
-        return True, f"Accepted: {top_label} (Score: {score:.2f})"
-    
-    elif(score <= 0.4):
-        return False, f"Rejected: {top_label} (Score: {score:.2f})"
-    
-    elif(0.4 < score < 0.7):
-        print(f"--- GRAY ZONE (Score {score:.2f}) - Calling Judge ---")
-        prompt = f"""You are a legal document classifier for a legal AI application.
+# Only the first PREVIEW_CHARS characters count towards the strong-signal score
+PREVIEW_CHARS = 2000
+
+def _build_negative_scanner():
+    """
+    One alternation over every negative category, one named group per category.
+    The patterns are all written as \\b(...)\\b in lowercase, so the shared word boundaries are
+    factored out and the scanner runs case-sensitively over lowercased text (several times
+    faster than IGNORECASE over multi-MB OCR output).
+    """
+    groups = []
+    for name, pattern in negative_patterns.items():
+        assert pattern.startswith(r"\b(") and pattern.endswith(r")\b"), name
+        groups.append(f"(?P<{name}>{pattern[3:-3]})")
+    return re.compile(r"\b(?:" + "|".join(groups) + r")\b")
+
+def _signal_groups():
+    groups = []
+    for category, patterns in STRONG_SIGNALS.items():
+        groups += [f"(?=(?P<{category}__{i}>{pattern}))" for i, pattern in enumerate(patterns)]
+    return groups
+
+def _build_signal_scanner():
+    """
+    One alternation over every strong signal, named "<category>__<index>". Each group sits in a
+    zero-width lookahead so a long hit (e.g. "AGREEMENT between .+ and") never swallows other
+    signals that start inside it. It only finds the offsets where some signal starts; see
+    SIGNAL_CHECKER for reading every signal at such an offset.
+    """
+    return re.compile("|".join(_signal_groups()), re.IGNORECASE)
+
+def _build_signal_checker():
+    """
+    The same lookaheads as a run of optional groups: matched at an offset, its groupdict() holds
+    every signal starting there (the alternation stops at the first one that matches).
+    """
+    return re.compile("".join(f"{group}?" for group in _signal_groups()), re.IGNORECASE)
+
+NEGATIVE_SCANNER = _build_negative_scanner()
+SIGNAL_SCANNER = _build_signal_scanner()
+SIGNAL_CHECKER = _build_signal_checker()
+
+def scan_text(text, preview_chars=PREVIEW_CHARS):
+    """
+    Single pass of NEGATIVE_SCANNER over the whole text and of SIGNAL_SCANNER over the preview
+    (strong signals only count in the preview, so there is no point scanning further). Returns:
+      "negative":  {category: hit count}
+      "positive":  {category: hit count}
+      "signals":   set of distinct strong-signal names (e.g. "police_fir__2") seen in the preview
+      "positions": {category: [start offsets]}
+    """
+    negative = {}
+    positive = {}
+    signals = set()
+    positions = {}
+    for match in NEGATIVE_SCANNER.finditer(text.lower()):
+        name = match.lastgroup
+        negative[name] = negative.get(name, 0) + 1
+        positions.setdefault(name, []).append(match.start())
+    preview = text[:preview_chars]
+    for match in SIGNAL_SCANNER.finditer(preview):
+        start = match.start()
+        for name, value in SIGNAL_CHECKER.match(preview, start).groupdict().items():
+            if value is None:
+                continue
+            category = name.partition("__")[0]
+            positive[category] = positive.get(category, 0) + 1
+            signals.add(name)
+            positions.setdefault(category, []).append(start)
+    return {"negative": negative, "positive": positive, "signals": signals, "positions": positions}
+
+def signal_score_from_scan(scan):
+    """Each distinct strong signal in the preview adds 0.1, capped at 0.4."""
+    return min(0.1 * len(scan["signals"]), 0.4)
+
+def negative_counts_from_scan(scan):
+    """Returns (total_matches, dominant_hits) from a scan's negative-category counts."""
+    hits = scan["negative"]
+    return sum(hits.values()), max(hits.values(), default=0)
+
+def is_negative_pattern(text):
+    return negative_counts_from_scan(scan_text(text))
+
+LABELS = [
+    # ACCEPT
+    "a legal contract, binding agreement, or personal legal document like a will",
+    "a police complaint, FIR, court summons, or judicial court finding",
+    "a legal notice, demand letter, or legal email correspondence",
+    "a property deed, civil record, or land registry document",
+    "a legal textbook, law article, or educational legal blog post",
+
+    # REJECT
+    "a resume, curriculum vitae, or professional profile",
+    "a financial invoice, bill, receipt, or payment document",
+    "a news article, blog post, or general informational content",
+    "a business email, personal letter, memo, or meeting minutes, a personal friendly email",
+]
+
+ACCEPT_LABELS = LABELS[:5]
+
+HYPOTHESIS_TEMPLATE = "This document is a {}."
+
+# Batch sizes for is_legal_documents
+CLASSIFIER_BATCH_SIZE = 8
+JUDGE_BATCH_SIZE = 8
+
+# Regex fast path: decide clear-cut documents from the scan alone, without loading the models.
+# Too many negative patterns always rejects (that rule never depended on the classifier);
+# the accept/reject shortcuts below only apply while REGEX_FAST_PATH is on.
+REGEX_FAST_PATH = os.getenv("GATEKEEPER_FAST_PATH", "1") == "1"
+FAST_ACCEPT_MIN_SIGNALS = 6      # distinct strong signals in the preview...
+FAST_ACCEPT_MIN_CATEGORIES = 2   # ...spread over at least this many categories, with no negative hits
+FAST_REJECT_MIN_NEGATIVE = 2     # negative hits that reject a document with no strong signal at all
+
+# How often each tier made the final decision (this process)
+tier_counts = {"regex_reject": 0, "regex_accept": 0, "classifier": 0, "judge": 0}
+_tier_lock = threading.Lock()
+
+def _count_tier(tier, n=1):
+    with _tier_lock:
+        tier_counts[tier] += n
+
+def gatekeeper_stats():
+    """Returns a copy of tier_counts plus the share of documents decided without any model."""
+    with _tier_lock:
+        counts = dict(tier_counts)
+    total = sum(counts.values())
+    regex = counts["regex_reject"] + counts["regex_accept"]
+    counts["regex_share"] = regex / total if total else 0.0
+    return counts
+
+def check_onnx_parity(texts):
+    """
+    Runs the PyTorch and the quantized ONNX classifier on the same previews and reports
+    top-label agreement and the largest score difference (see onnx_backend.classifier_parity).
+    """
+    reference = _load_pytorch_classifier()
+    candidate = onnx_backend.load_onnx_classifier(CLASSIFIER_MODEL)
+    previews = [text[:PREVIEW_CHARS] for text in texts]
+    return onnx_backend.classifier_parity(reference, candidate, previews, LABELS, HYPOTHESIS_TEMPLATE)
+
+def load_text(input_data):
+    """A .pdf path is run through the extraction pipeline; anything else is treated as the text itself."""
+    if os.path.exists(input_data) and input_data.lower().endswith(".pdf"):
+        print(f"Processing file: {input_data}")
+        return process_pdf_for_text(input_data)
+    return input_data
+
+def build_judge_prompt(text):
+    return f"""You are a legal document classifier for a legal AI application.
         Classify the document below. Answer only "yes" or "no".
         Answer "yes" if the document is ONE of these:
         - A legal contract, service agreement, NDA, or binding agreement between parties
@@ -196,12 +303,156 @@ def is_legal_document(input_data):
         Document: {text[:500]}
 
         Is this a legal document? Answer yes or no:"""
-        
+
+def _combine_scores(scan, result):
+    """Final score: strong signals (max 0.4) + 0.6 * the top zero-shot score. Returns (score, top_label)."""
+    top_label = result['labels'][0]
+    top_score = result['scores'][0] * 0.6
+    total_score = signal_score_from_scan(scan) + top_score
+
+    # debugging
+    # print(f"[DEBUG] signal={signal_score_from_scan(scan):.2f} | zsc={top_score:.2f} | total={total_score:.2f} | label={top_label}")
+
+    return total_score, top_label
+
+def _verify_document(input_data):
+    """verify_document plus the signal scan, so callers don't have to scan the text again."""
+    full_text = load_text(input_data)
+    scan = scan_text(full_text)
+
+    classifier = get_classifier()
+    result = classifier(
+        full_text[:PREVIEW_CHARS], 
+        LABELS, 
+        hypothesis_template=HYPOTHESIS_TEMPLATE
+    )
+    total_score, top_label = _combine_scores(scan, result)
+    return total_score, top_label, full_text, ACCEPT_LABELS, scan
+
+def verify_document(input_data):
+    score, top_label, full_text, ACCEPT_LABELS, _ = _verify_document(input_data)
+    return score, top_label, full_text, ACCEPT_LABELS
+
+def _negative_verdict(scan):
+    """Regex stage: returns a rejection when the negative patterns are decisive, otherwise None."""
+    total_matches, dominant_hits = negative_counts_from_scan(scan)
+    if total_matches >= 4 or dominant_hits >= 3:
+        return False, "Rejected: Too many negative patterns."
+    return None
+
+def _fast_path_verdict(scan):
+    """Decisive regex-only verdicts; None means the document needs the classifier."""
+    total_matches, _ = negative_counts_from_scan(scan)
+    signals = len(scan["signals"])
+    if signals >= FAST_ACCEPT_MIN_SIGNALS and len(scan["positive"]) >= FAST_ACCEPT_MIN_CATEGORIES and total_matches == 0:
+        return True, f"Accepted: {signals} strong legal signals (regex fast path)"
+    if signals == 0 and total_matches >= FAST_REJECT_MIN_NEGATIVE:
+        return False, f"Rejected: {total_matches} negative patterns and no legal signals (regex fast path)"
+    return None
+
+def _regex_verdict(scan, fast_path):
+    """Regex tier: the negative-pattern rule, then (optionally) the fast path. Counts the decision."""
+    verdict = _negative_verdict(scan)
+    if verdict is None and fast_path:
+        verdict = _fast_path_verdict(scan)
+    if verdict is not None:
+        _count_tier("regex_accept" if verdict[0] else "regex_reject")
+    return verdict
+
+def _score_verdict(score, top_label):
+    """Classifier stage: returns (is_legal, reason), or None when the score is in the gray zone."""
+    if(score >= 0.6 and top_label not in ACCEPT_LABELS):
+        return False, f"Rejected: Identified as {top_label} (Score: {score:.2f})"
+
+    if(score >= 0.7 and top_label in ACCEPT_LABELS):
+        return True, f"Accepted: {top_label} (Score: {score:.2f})"
+
+    elif(score <= 0.4):
+        return False, f"Rejected: {top_label} (Score: {score:.2f})"
+
+    return None
+
+def _judge_verdict(generated_text, score, top_label):
+    if "yes" in generated_text.lower():
+        return True, f"Accepted by Judge: {top_label} (Original Score: {score:.2f})"
+    else:
+        return False, f"Rejected by Judge: {top_label} (Original Score: {score:.2f})"
+
+def _generated_text(output):
+    # A batched call returns one entry per input; some pipeline versions wrap each in a list
+    if isinstance(output, list):
+        output = output[0]
+    return output['generated_text']
+
+def is_legal_document(input_data, fast_path=None):
+    """
+    Returns (is_legal, reason). The regex tier runs first and only undecided documents
+    load and run the zero-shot classifier (and, in the gray zone, the judge).
+    fast_path overrides REGEX_FAST_PATH.
+    """
+    fast_path = REGEX_FAST_PATH if fast_path is None else fast_path
+    text = load_text(input_data)
+    scan = scan_text(text)
+    verdict = _regex_verdict(scan, fast_path)
+    if verdict is not None:
+        return verdict
+
+    classifier = get_classifier()
+    result = classifier(text[:PREVIEW_CHARS], LABELS, hypothesis_template=HYPOTHESIS_TEMPLATE)
+    score, top_label = _combine_scores(scan, result)
+    verdict = _score_verdict(score, top_label)
+    if verdict is not None:
+        _count_tier("classifier")
+        return verdict
+
+    print(f"--- GRAY ZONE (Score {score:.2f}) - Calling Judge ---")
+    judge_model = get_judge_model()
+    response = judge_model(build_judge_prompt(text))
+    _count_tier("judge")
+    return _judge_verdict(_generated_text(response), score, top_label)
+
+def is_legal_documents(inputs, classifier_batch_size=None, judge_batch_size=None, fast_path=None):
+    """
+    Batch version of is_legal_document. Returns one (is_legal, reason) per input, in order.
+    The regex tier runs over every input first; only documents it can't decide go to the
+    zero-shot classifier, as one batched call, and only the gray-zone ones then go to the
+    judge, again as one batched call.
+    """
+    fast_path = REGEX_FAST_PATH if fast_path is None else fast_path
+    texts = [load_text(input_data) for input_data in inputs]
+    scans = [scan_text(text) for text in texts]
+    verdicts = [_regex_verdict(scan, fast_path) for scan in scans]
+
+    # 1. Zero-shot classifier for everything the regex tier did not decide
+    undecided = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    scores = {}
+    if undecided:
+        classifier = get_classifier()
+        results = classifier(
+            [texts[i][:PREVIEW_CHARS] for i in undecided],
+            LABELS,
+            hypothesis_template=HYPOTHESIS_TEMPLATE,
+            batch_size=classifier_batch_size or CLASSIFIER_BATCH_SIZE,
+        )
+        if isinstance(results, dict): # a single input comes back unwrapped
+            results = [results]
+        for i, result in zip(undecided, results):
+            scores[i] = _combine_scores(scans[i], result)
+            verdicts[i] = _score_verdict(*scores[i])
+            if verdicts[i] is not None:
+                _count_tier("classifier")
+
+    # 2. Judge for the gray zone
+    gray = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if gray:
+        print(f"--- GRAY ZONE: {len(gray)} of {len(inputs)} documents - Calling Judge ---")
         judge_model = get_judge_model()
-        response = judge_model(prompt)
-        generated_text = response[0]['generated_text'].lower()
-        
-        if "yes" in generated_text:
-            return True, f"Accepted by Judge: {top_label} (Original Score: {score:.2f})"
-        else:
-            return False, f"Rejected by Judge: {top_label} (Original Score: {score:.2f})"
\ No newline at end of file
+        responses = judge_model(
+            [build_judge_prompt(texts[i]) for i in gray],
+            batch_size=judge_batch_size or JUDGE_BATCH_SIZE,
+        )
+        for i, response in zip(gray, responses):
+            verdicts[i] = _judge_verdict(_generated_text(response), *scores[i])
+        _count_tier("judge", len(gray))
+
+    return verdicts
@@ -0,0 +1,101 @@
+import threading
+import time
+
+# One shared instance per model per process. Modules register a loader (and optionally a warm-up
+# call, i.e. a dummy inference) at import time and fetch the model with get(); the app can
+# preload() models at start-up, optionally on a background thread, so the first user after a
+# restart doesn't pay the cold start.
+_models = {}
+_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, loader, warmup):
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.state = "not_loaded" # not_loaded -> loading -> ready | failed
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.error = None
+        self.lock = threading.Lock()
+
+
+def register(name, loader, warmup=None):
+    """Registers a model loader. Re-registering a name keeps an already loaded instance."""
+    with _lock:
+        if name not in _models:
+            _models[name] = _Entry(loader, warmup)
+
+
+def get(name):
+    """Returns the shared instance, loading (and warming up) it on first use."""
+    entry = _models[name]
+    if entry.state == "ready":
+        return entry.model
+    with entry.lock:
+        if entry.state != "ready":
+            _load(name, entry)
+    return entry.model
+
+
+def _load(name, entry):
+    entry.state = "loading"
+    entry.error = None
+    try:
+        start = time.perf_counter()
+        model = entry.loader()
+        entry.load_seconds = time.perf_counter() - start
+        if entry.warmup is not None:
+            start = time.perf_counter()
+            entry.warmup(model)
+            entry.warmup_seconds = time.perf_counter() - start
+    except Exception as e:
+        entry.state = "failed"
+        entry.error = repr(e)
+        raise
+    entry.model = model
+    entry.state = "ready"
+    print(f"Model '{name}' ready (load {entry.load_seconds:.1f}s, warm-up {entry.warmup_seconds or 0:.1f}s).")
+
+
+def preload(names=None, background=False):
+    """
+    Loads and warms up the given models (all registered ones by default). With background=True
+    this returns immediately and loads on a daemon thread; failures are recorded in status().
+    """
+    names = list(names or _models)
+    unknown = [name for name in names if name not in _models]
+    if unknown:
+        print(f"Warning: not preloading unregistered model(s) {', '.join(unknown)} "
+              f"(registered: {', '.join(_models) or 'none'}); import the module that registers them first.")
+    names = [name for name in names if name in _models]
+
+    def run():
+        for name in names:
+            if _models[name].state in ("ready", "loading"):
+                continue
+            try:
+                get(name)
+            except Exception as e:
+                print(f"Preloading model '{name}' failed: {e}")
+
+    if background:
+        thread = threading.Thread(target=run, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+    run()
+    return None
+
+
+def status():
+    """Returns {name: {"state", "load_seconds", "warmup_seconds", "error"}} for every registered model."""
+    return {
+        name: {
+            "state": entry.state,
+            "load_seconds": entry.load_seconds,
+            "warmup_seconds": entry.warmup_seconds,
+            "error": entry.error,
+        }
+        for name, entry in list(_models.items())
+    }
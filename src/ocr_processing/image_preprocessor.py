@@ -1,11 +1,145 @@
 import cv2
+import numpy as np
 from pathlib import Path
 
+# Preprocessing defaults. Every step can be switched off per call; threshold="otsu" with the
+# other steps disabled reproduces the original grayscale + global Otsu behaviour.
+TARGET_DPI = 300                # Tesseract's sweet spot; bigger pages only cost time
+PAGE_LONG_SIDE_INCHES = 11.69   # A4, used to estimate the DPI of images that don't state it
+DPI_TOLERANCE = 0.1             # don't resample when within 10% of the target
+DESKEW = True
+MAX_SKEW_DEGREES = 5.0
+MIN_SKEW_DEGREES = 0.3          # smaller angles aren't worth a rotation
+SKEW_ESTIMATE_WIDTH = 800       # skew is estimated on a copy downscaled to this width
+THRESHOLD_METHOD = "auto"       # "auto", "otsu" or "adaptive"
+# "auto" switches to adaptive thresholding when the page background varies by more than
+# this many grey levels (shadows, uneven lighting, stained paper), where one global Otsu cut fails.
+BACKGROUND_RANGE_FOR_ADAPTIVE = 40
+ADAPTIVE_BLOCK_SIZE = 31
+ADAPTIVE_C = 15
+DENOISE = True
+CROP_MARGINS = True
+CROP_PADDING = 10
+# Rows/columns darker than this fraction are treated as scanner borders, not text
+BORDER_INK_FRACTION = 0.9
 
-# Extract text from dirty image
-def preprocess_image(image_path):
-    img = cv2.imread(str(image_path)) # read the image using cv2.imread
-    gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) # convert the image to grayscale
-    _, thresh_img = cv2.threshold(gray_img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU) # Applying binary threshold to the image, .THRESH_OTSU is a global thresholding method
 
-    return thresh_img
\ No newline at end of file
+def to_grayscale(image):
+    """Accepts an image path or an in-memory array (grayscale, RGB or RGBA) and returns a grayscale array."""
+    if isinstance(image, np.ndarray):
+        img = image
+    else:
+        img = cv2.imread(str(image)) # read the image using cv2.imread
+
+    if img.ndim == 2:
+        return img # already grayscale (e.g. rendered with fitz.csGRAY)
+    if isinstance(image, np.ndarray):
+        code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY # fitz samples are RGB(A), not BGR
+        return cv2.cvtColor(img, code)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) # convert the image to grayscale
+
+
+def normalize_dpi(gray, source_dpi=None, target_dpi=TARGET_DPI):
+    """
+    Resamples the page to target_dpi. When source_dpi is unknown it is estimated from the
+    page size (assuming A4), and the image is only ever downscaled, never blown up.
+    """
+    if not target_dpi:
+        return gray
+    estimated = source_dpi is None
+    if estimated:
+        source_dpi = max(gray.shape) / PAGE_LONG_SIDE_INCHES
+    scale = target_dpi / source_dpi
+    if abs(scale - 1) <= DPI_TOLERANCE or (estimated and scale > 1):
+        return gray
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def _profile_score(ink, angle):
+    """Variance of the row ink profile after rotating by angle: highest when text lines are horizontal."""
+    h, w = ink.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(ink, matrix, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    return float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+
+
+def estimate_skew(gray, max_angle=MAX_SKEW_DEGREES):
+    """
+    Returns the rotation (in degrees, counter-clockwise) that straightens the text lines,
+    found by a coarse-then-fine projection-profile search on a downscaled copy.
+    """
+    small = gray
+    if gray.shape[1] > SKEW_ESTIMATE_WIDTH:
+        scale = SKEW_ESTIMATE_WIDTH / gray.shape[1]
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+
+    # 1. Whole degrees over the allowed range, 2. tenths of a degree around the best one
+    best = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=lambda a: _profile_score(ink, a))
+    best = max(np.arange(best - 1.0, best + 1.05, 0.1), key=lambda a: _profile_score(ink, a))
+    return float(round(best, 1))
+
+
+def deskew(gray, max_angle=MAX_SKEW_DEGREES):
+    angle = estimate_skew(gray, max_angle)
+    if abs(angle) < MIN_SKEW_DEGREES:
+        return gray
+    h, w = gray.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def choose_threshold_method(gray):
+    """'adaptive' when the page background is uneven, otherwise 'otsu' (faster and cleaner on flat scans)."""
+    # Shrinking to 64x64 and dilating wipes out the text and leaves the background/illumination
+    small = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA)
+    background = cv2.dilate(small, np.ones((7, 7), np.uint8)) # paper is the brightest thing around
+    low, high = np.percentile(background, [5, 95])
+    return "adaptive" if high - low > BACKGROUND_RANGE_FOR_ADAPTIVE else "otsu"
+
+
+def binarize(gray, method=THRESHOLD_METHOD):
+    if method == "auto":
+        method = choose_threshold_method(gray)
+    if method == "adaptive":
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     ADAPTIVE_BLOCK_SIZE, ADAPTIVE_C)
+    _, thresh_img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU) # .THRESH_OTSU is a global thresholding method
+    return thresh_img
+
+
+def crop_margins(binary, padding=CROP_PADDING):
+    """Crops to the bounding box of the ink (black pixels), ignoring solid scanner borders. Blank pages are returned as is."""
+    ink = binary == 0
+    # Blank out the border rows/columns first so they don't count as ink in the other direction
+    ink[ink.mean(axis=1) >= BORDER_INK_FRACTION, :] = False
+    ink[:, ink.mean(axis=0) >= BORDER_INK_FRACTION] = False
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if len(rows) == 0 or len(cols) == 0:
+        return binary
+    top, bottom = max(rows[0] - padding, 0), min(rows[-1] + padding + 1, binary.shape[0])
+    left, right = max(cols[0] - padding, 0), min(cols[-1] + padding + 1, binary.shape[1])
+    return binary[top:bottom, left:right]
+
+
+# Extract text from dirty image
+def preprocess_image(image, source_dpi=None, target_dpi=TARGET_DPI, deskew_page=DESKEW,
+                     threshold=THRESHOLD_METHOD, denoise=DENOISE, crop=CROP_MARGINS):
+    """
+    Accepts an image path or an in-memory array (grayscale, RGB or RGBA) and returns the
+    binarized page, ready for Tesseract: DPI normalization -> denoise -> deskew ->
+    threshold (adaptive or Otsu, chosen per page by default) -> margin crop.
+    Pass source_dpi when it is known (e.g. a page rendered from a PDF).
+    """
+    gray_img = to_grayscale(image)
+    gray_img = normalize_dpi(gray_img, source_dpi, target_dpi)
+    if denoise:
+        gray_img = cv2.medianBlur(gray_img, 3) # removes salt-and-pepper scanner noise
+    if deskew_page:
+        gray_img = deskew(gray_img)
+    thresh_img = binarize(gray_img, threshold)
+    if crop:
+        thresh_img = crop_margins(thresh_img)
+    return thresh_img
@@ -1,10 +1,10 @@
-import os
-import pytesseract
-from PIL import Image
-from .image_preprocessor import preprocess_image
+from .image_preprocessor import preprocess_image, TARGET_DPI
+from .ocr_engine import get_engine
 
 # Extract text from clean image
-def extract_text_from_image(image_path):
-    clean_img = preprocess_image(image_path)
-    text = pytesseract.image_to_string(clean_img).lower()
+def extract_text_from_image(image, source_dpi=None):
+    """image can be a file path or an in-memory NumPy array; source_dpi is its resolution, if known."""
+    clean_img = preprocess_image(image, source_dpi=source_dpi)
+    # With a known source DPI the page has been resampled to TARGET_DPI; otherwise let Tesseract guess
+    text = get_engine().image_to_text(clean_img, dpi=TARGET_DPI if source_dpi else None).lower()
     return text
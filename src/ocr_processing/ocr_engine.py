@@ -0,0 +1,94 @@
+import os
+import threading
+
+# OCR engine abstraction. "tesserocr" keeps one Tesseract API (with its language data loaded)
+# alive per process and feeds it pages in memory; "pytesseract" spawns a `tesseract` process
+# and round-trips a temp file for every page, and is only the fallback when tesserocr
+# (`pip install tesserocr`, built against libtesseract-dev) isn't installed.
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto") # "auto", "tesserocr" or "pytesseract"
+OCR_LANG = os.getenv("OCR_LANG", "eng")      # e.g. "eng+hin" for bilingual documents
+OCR_PSM = int(os.getenv("OCR_PSM", 3))       # page segmentation mode (3 = fully automatic)
+OCR_OEM = int(os.getenv("OCR_OEM", 3))       # OCR engine mode (1 = LSTM only, 3 = default)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class TesserocrEngine:
+    """Persistent in-process Tesseract. The API isn't thread-safe, so calls are serialized."""
+
+    name = "tesserocr"
+
+    def __init__(self, lang=OCR_LANG, psm=OCR_PSM, oem=OCR_OEM):
+        import tesserocr
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM(psm), oem=tesserocr.OEM(oem))
+        self.lock = threading.Lock()
+
+    def image_to_text(self, image, dpi=None):
+        from PIL import Image
+        with self.lock:
+            self.api.SetImage(Image.fromarray(image))
+            if dpi:
+                self.api.SetSourceResolution(int(dpi))
+            return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+
+class PytesseractEngine:
+    """One `tesseract` subprocess per page (the original behaviour)."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang=OCR_LANG, psm=OCR_PSM, oem=OCR_OEM):
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+
+    def config(self, dpi=None):
+        config = f"--psm {self.psm} --oem {self.oem}"
+        return f"{config} --dpi {int(dpi)}" if dpi else config
+
+    def image_to_text(self, image, dpi=None):
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.config(dpi))
+
+    def close(self):
+        pass
+
+
+ENGINES = {
+    "tesserocr": TesserocrEngine,
+    "pytesseract": PytesseractEngine,
+}
+
+
+def create_engine(name=None, **options):
+    """Builds an engine by name; "auto" prefers tesserocr and falls back to pytesseract."""
+    name = name or OCR_ENGINE
+    if name != "auto":
+        return ENGINES[name](**options)
+    try:
+        return TesserocrEngine(**options)
+    except ImportError:
+        return PytesseractEngine(**options)
+
+
+def get_engine():
+    """The process-wide engine, created on first use (so each OCR pool worker loads it once)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine()
+            print(f"OCR engine: {_engine.name} (lang={OCR_LANG}, psm={OCR_PSM}, oem={OCR_OEM})")
+        return _engine
+
+
+def set_engine(engine):
+    """Swaps the process-wide engine (e.g. a different language or PSM for one batch)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine is not engine:
+            _engine.close()
+        _engine = engine
@@ -1,9 +1,20 @@
 import fitz
-import os
+import numpy as np
 
-def convert_pdf_to_images(file_path, output_folder):
-    doc = fitz.open(file_path)
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        pix =  page.get_pixmap() # convert page to image
-        pix.save(f"{output_folder}/page-{page_num}.jpg") # saves the image in the output folderand .jpg
\ No newline at end of file
+def render_page(doc, page_num, dpi=None, gray=True):
+    """Rasterizes one page straight to a pixmap (grayscale by default, so no colour conversion is needed later)."""
+    page = doc.load_page(page_num)
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    if dpi:
+        return page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+    return page.get_pixmap(colorspace=colorspace, alpha=False)
+
+def pixmap_to_array(pix):
+    """
+    Wraps the pixmap's sample buffer as a uint8 NumPy array without copying.
+    The array shares memory with pix, so keep the pixmap alive while using it.
+    """
+    img = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    if pix.n == 1:
+        return img.reshape(pix.height, pix.width)
+    return img.reshape(pix.height, pix.width, pix.n)
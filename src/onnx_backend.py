@@ -0,0 +1,109 @@
+import os
+
+# Optional ONNX Runtime backend for the gatekeeper models. The PyTorch models are exported to ONNX
+# once, dynamically quantized to int8 and cached under ONNX_MODEL_DIR; later loads read the
+# quantized files directly. Needs `pip install optimum[onnxruntime]`; without it (or if the
+# export fails) legal_doc_check falls back to the regular PyTorch pipelines.
+GATEKEEPER_BACKEND = os.getenv("GATEKEEPER_BACKEND", "pytorch") # "pytorch" or "onnx"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(".cache", "onnx_models"))
+# Instruction set the int8 kernels target: "avx2", "avx512", "avx512_vnni" or "arm64"
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+
+SEQ2SEQ_FILES = ["encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx"]
+
+
+def _quantization_config():
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    return getattr(AutoQuantizationConfig, ONNX_QUANTIZATION)(is_static=False, per_channel=False)
+
+
+def _model_dir(model_id, kind):
+    return os.path.join(ONNX_MODEL_DIR, model_id.replace("/", "__"), kind)
+
+
+def _export_classifier(model_id, export_dir, quantized_dir):
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {model_id} to ONNX (one-off)...")
+    model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+    model.save_pretrained(export_dir)
+    quantizer = ORTQuantizer.from_pretrained(export_dir)
+    quantizer.quantize(save_dir=quantized_dir, quantization_config=_quantization_config())
+    model.config.save_pretrained(quantized_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(quantized_dir)
+
+
+def _export_seq2seq(model_id, export_dir, quantized_dir):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {model_id} to ONNX (one-off)...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_id, export=True, use_merged=False)
+    model.save_pretrained(export_dir)
+    for file_name in SEQ2SEQ_FILES:
+        if os.path.exists(os.path.join(export_dir, file_name)):
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=file_name)
+            quantizer.quantize(save_dir=quantized_dir, quantization_config=_quantization_config())
+    model.config.save_pretrained(quantized_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(quantized_dir)
+
+
+def load_onnx_classifier(model_id):
+    """Zero-shot classification pipeline running an int8 ONNX export of model_id."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    quantized_dir = _model_dir(model_id, "quantized")
+    if not os.path.exists(os.path.join(quantized_dir, "model_quantized.onnx")):
+        _export_classifier(model_id, _model_dir(model_id, "export"), quantized_dir)
+
+    model = ORTModelForSequenceClassification.from_pretrained(quantized_dir, file_name="model_quantized.onnx")
+    tokenizer = AutoTokenizer.from_pretrained(quantized_dir)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+def load_onnx_judge(model_id):
+    """text2text-generation pipeline running an int8 ONNX export of model_id."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer, pipeline
+
+    quantized_dir = _model_dir(model_id, "quantized")
+    if not os.path.exists(os.path.join(quantized_dir, "encoder_model_quantized.onnx")):
+        _export_seq2seq(model_id, _model_dir(model_id, "export"), quantized_dir)
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        quantized_dir,
+        encoder_file_name="encoder_model_quantized.onnx",
+        decoder_file_name="decoder_model_quantized.onnx",
+        decoder_with_past_file_name="decoder_with_past_model_quantized.onnx",
+    )
+    tokenizer = AutoTokenizer.from_pretrained(quantized_dir)
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer)
+
+
+def classifier_parity(reference, candidate, texts, labels, hypothesis_template):
+    """
+    Compares two zero-shot pipelines on the same texts. Returns a dict with the share of texts
+    where the top label agrees, the indexes of the texts where it doesn't and the largest
+    absolute score difference for any label.
+    """
+    top_label_matches = 0
+    mismatches = []
+    max_score_diff = 0.0
+    for index, text in enumerate(texts):
+        expected = reference(text, labels, hypothesis_template=hypothesis_template)
+        actual = candidate(text, labels, hypothesis_template=hypothesis_template)
+        if expected["labels"][0] == actual["labels"][0]:
+            top_label_matches += 1
+        else:
+            mismatches.append(index)
+        actual_scores = dict(zip(actual["labels"], actual["scores"]))
+        for label, score in zip(expected["labels"], expected["scores"]):
+            max_score_diff = max(max_score_diff, abs(score - actual_scores[label]))
+    return {
+        "texts": len(texts),
+        "top_label_agreement": top_label_matches / len(texts) if texts else 1.0,
+        "mismatches": mismatches,
+        "max_score_diff": max_score_diff,
+    }
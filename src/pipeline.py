@@ -1,54 +1,180 @@
-import tempfile
 import os
-import fitz  # PyMuPDF
-from src.ocr_processing.pdf_processor import convert_pdf_to_images
-from src.ocr_processing.image_to_text import extract_text_from_image
+import time
+from collections import deque
+from src.extraction_cache import file_sha256, get_cached, put_cached
 # from src.cosdata_store import index_document
 
-MIN_TEXT_LENGTH_FOR_DIGITAL = 100  
+# Bump when extraction/OCR behaviour changes so cached page text is not reused.
+PIPELINE_VERSION = "pages-2"
 
-def attempt_digital_extraction(file_path):
-    """Tries to extract text directly. Returns (text, is_digital)"""
-    print("Attempting digital extraction...")
+# Per-page routing: a page is OCR'd when its text layer is shorter than this...
+MIN_PAGE_TEXT_LENGTH = 50
+# ...or when images cover at least this fraction of it and its text layer is still thin
+# (e.g. a scanned page with only a digital header or stamp on top).
+SCANNED_PAGE_IMAGE_COVERAGE = 0.6
+SCANNED_PAGE_MAX_TEXT_LENGTH = 300
+# Number of worker processes used for page-level OCR. 1 keeps everything in-process.
+OCR_WORKERS = os.cpu_count() or 1
+# OCR pages are rasterized straight into memory (lossless, no temp files) at this DPI. None renders
+# at the preprocessor's TARGET_DPI, so pages come out at the resolution Tesseract wants and are never resampled.
+OCR_DPI = None
+
+# PyMuPDF, the OCR stack (OpenCV, pytesseract) and the process pool are imported inside the functions that use
+# them, so importing this module (e.g. from the regex gatekeeper) stays cheap.
+
+# Per-process handle so pool workers don't re-open the PDF for every page.
+_worker_doc = None
+_worker_doc_path = None
+_ocr_pool = None
+_ocr_pool_workers = None
+
+def _open_worker_doc(file_path):
+    global _worker_doc, _worker_doc_path
+    import fitz  # PyMuPDF
+    # Workers outlive a single document, so a path rewritten since it was opened must be re-opened
+    key = (file_path, os.path.getmtime(file_path))
+    if _worker_doc_path != key:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = fitz.open(file_path)
+        _worker_doc_path = key
+    return _worker_doc
+
+def _ocr_pdf_page(job):
+    """Worker task: rasterizes one PDF page in memory and OCRs it. Returns (page_num, text, seconds)."""
+    from src.ocr_processing.pdf_processor import render_page, pixmap_to_array
+    from src.ocr_processing.image_to_text import extract_text_from_image
+    from src.ocr_processing.image_preprocessor import TARGET_DPI
+    file_path, page_num, dpi = job
+    dpi = dpi or TARGET_DPI
+    start = time.perf_counter()
+    doc = _open_worker_doc(file_path)
+    pix = render_page(doc, page_num, dpi)
+    text = extract_text_from_image(pixmap_to_array(pix), source_dpi=dpi) # pix stays alive until OCR is done
+    return page_num, text, time.perf_counter() - start
+
+def _init_ocr_worker():
+    """Pool initializer: loads the OCR engine (and its language data) once per worker process."""
+    from src.ocr_processing.ocr_engine import get_engine
+    get_engine()
+
+def _get_ocr_pool(workers):
+    """
+    The long-lived OCR pool, shared by every document processed in this process, so worker
+    start-up and engine loading are paid once rather than per document.
+    """
+    global _ocr_pool, _ocr_pool_workers
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if _ocr_pool is not None and (_ocr_pool_workers != workers or getattr(_ocr_pool, "_broken", False)):
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+        _ocr_pool = None
+    if _ocr_pool is None:
+        # spawn, not fork: this runs inside job workers and the app, which already have threads
+        # (heartbeat, LLM gateway loop) that a fork could copy mid-lock
+        _ocr_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        _ocr_pool_workers = workers
+    return _ocr_pool
+
+def _page_record(page_num, text, method, seconds):
+    return {"page_num": page_num, "text": text, "method": method, "seconds": seconds}
+
+def image_coverage(page):
+    """Fraction of the page area covered by embedded images (overlaps counted once per image, capped at 1)."""
+    import fitz  # PyMuPDF
+    page_area = page.rect.get_area()
+    if not page_area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += (fitz.Rect(info["bbox"]) & page.rect).get_area()
+    return min(covered / page_area, 1.0)
+
+def classify_page(page):
+    """
+    Decides whether a single page has a usable text layer.
+    Returns (text, needs_ocr).
+    """
     try:
-        doc = fitz.open(file_path)
-        full_text = ""
-        for page in doc:
-            full_text += page.get_text()
-        doc.close()
-
-        if len(full_text.strip()) > MIN_TEXT_LENGTH_FOR_DIGITAL:
-            print("Digital extraction SUCCESSFUL.")
-            return full_text, True
-        else:
-            print("Digital extraction failed (text too short), falling back to OCR.")
-            return None, False
+        text = page.get_text()
     except Exception as e:
-        print(f"Digital extraction error: {e}. Falling back to OCR.")
-        return None, False
-
-def perform_ocr_extraction(file_path, tmp_dir):
-    """Your original OCR-based image pipeline."""
-    print("Performing full OCR extraction...")
-    images = convert_pdf_to_images(file_path, tmp_dir)
-    full_text = ""
-    for filename in os.listdir(tmp_dir):
-        if filename.endswith(".jpg"): 
-            full_path = os.path.join(tmp_dir, filename)
-            full_text += extract_text_from_image(full_path)
-    print("OCR extraction complete.")
-    return full_text
-
-def process_pdf_for_text(file_path):
+        print(f"Digital extraction error on page {page.number}: {e}. Falling back to OCR.")
+        return "", True
+
+    text_length = len(text.strip())
+    if text_length < MIN_PAGE_TEXT_LENGTH:
+        return text, True
+    if text_length < SCANNED_PAGE_MAX_TEXT_LENGTH and image_coverage(page) >= SCANNED_PAGE_IMAGE_COVERAGE:
+        return text, True
+    return text, False
+
+def _drain_pages(queue, block):
+    """Yields finished page records from the front of the queue, keeping page order."""
+    while queue:
+        item = queue[0]
+        if not isinstance(item, dict): # a pending OCR future
+            if not block and not item.done():
+                return
+            page_num, text, seconds = item.result()
+            item = _page_record(page_num, text, "ocr", seconds)
+        queue.popleft()
+        yield item
+
+def iter_pdf_pages(file_path, ocr_workers=None):
     """
-    New pipeline: Hybrid Parsing + Session-aware Indexing.
+    Streaming variant of process_pdf_for_text. Yields one record per page, in page order,
+    as soon as it is ready: {"page_num", "text", "method" ("digital" or "ocr"), "seconds"}.
+    Each page is routed on its own: pages with a usable text layer are read directly and
+    only pages without one are rasterized and OCR'd (in a process pool when ocr_workers > 1).
+    """
+    import fitz  # PyMuPDF
+    workers = OCR_WORKERS if ocr_workers is None else ocr_workers
+    queue = deque()
+    try:
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                start = time.perf_counter()
+                text, needs_ocr = classify_page(page)
+                if not needs_ocr:
+                    queue.append(_page_record(page.number, text, "digital", time.perf_counter() - start))
+                elif workers <= 1:
+                    page_num, text, seconds = _ocr_pdf_page((file_path, page.number, OCR_DPI))
+                    queue.append(_page_record(page_num, text, "ocr", seconds))
+                else:
+                    queue.append(_get_ocr_pool(workers).submit(_ocr_pdf_page, (file_path, page.number, OCR_DPI)))
+                yield from _drain_pages(queue, block=False)
+        yield from _drain_pages(queue, block=True)
+    finally:
+        # The pool is shared, so only this document's unfinished pages are cancelled
+        for item in queue:
+            if not isinstance(item, dict):
+                item.cancel()
+
+def extract_pages(file_path, ocr_workers=None, use_cache=True):
+    """
+    Returns the list of page records for a PDF, reusing a cached result when the
+    same file bytes were already processed by this PIPELINE_VERSION.
     """
-    # 1. Try fast digital extraction
-    full_text, is_digital = attempt_digital_extraction(file_path)
+    digest = file_sha256(file_path) if use_cache else None
+    if use_cache:
+        pages = get_cached("pages", digest, PIPELINE_VERSION)
+        if pages is not None:
+            print("Extraction cache HIT.")
+            return pages
+
+    pages = list(iter_pdf_pages(file_path, ocr_workers))
+    if use_cache:
+        put_cached("pages", digest, PIPELINE_VERSION, pages)
+    return pages
 
-    if not is_digital:
-        # 2. Fallback to slow OCR
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            full_text = perform_ocr_extraction(file_path, tmp_dir)
-            
-    return full_text
\ No newline at end of file
+def process_pdf_for_text(file_path, ocr_workers=None, use_cache=True):
+    """
+    New pipeline: Hybrid Parsing + Session-aware Indexing.
+    Pages are routed individually, so only pages without a text layer go through OCR.
+    ocr_workers overrides OCR_WORKERS for those pages.
+    """
+    pages = extract_pages(file_path, ocr_workers, use_cache)
+    ocr_count = sum(1 for page in pages if page["method"] == "ocr")
+    print(f"Extracted {len(pages)} pages ({len(pages) - ocr_count} digital, {ocr_count} OCR).")
+    return "".join(page["text"] for page in pages)
\ No newline at end of file
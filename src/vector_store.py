@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+# Vector store backends for RAG retrieval. Both speak the same small interface:
+#   upsert(ids, vectors, metadatas), search(query_vector, top_k, filters), delete(filters, ids), reset()
+# search() returns a list of {"id", "score", "metadata"} sorted by score, highest first.
+EMBEDDING_DIMENSION = 384 # all-MiniLM-L6-v2
+
+
+def _matches(metadata, filters):
+    return all(metadata.get(key) == value for key, value in (filters or {}).items())
+
+
+class VectorStore:
+    """Interface shared by the local and Cosdata backends."""
+
+    def upsert(self, ids, vectors, metadatas):
+        raise NotImplementedError
+
+    def search(self, query_vector, top_k=5, filters=None):
+        raise NotImplementedError
+
+    def delete(self, filters=None, ids=None):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+
+class _Segment:
+    """The vectors of one partition (one document): an L2-normalised matrix plus ids and metadata."""
+
+    def __init__(self, dimension, vectors=None, ids=None, metadatas=None):
+        self.dimension = dimension
+        self.vectors = vectors if vectors is not None else np.empty((0, dimension), dtype=np.float32)
+        self.ids = ids or []
+        self.metadatas = metadatas or []
+        self.size = len(self.ids)
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+
+    def _reserve(self, extra):
+        # Grow by doubling so repeated upserts stay amortised O(1) per vector
+        needed = self.size + extra
+        if isinstance(self.vectors, np.memmap) or needed > len(self.vectors):
+            capacity = max(needed, 2 * len(self.vectors), 64)
+            grown = np.empty((capacity, self.dimension), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+
+    def upsert(self, vector_id, vector, metadata):
+        row = self.rows.get(vector_id)
+        if row is None:
+            self._reserve(1)
+            row = self.size
+            self.size += 1
+            self.rows[vector_id] = row
+            self.ids.append(vector_id)
+            self.metadatas.append(metadata)
+        else:
+            self.metadatas[row] = metadata
+        self.vectors[row] = vector
+
+    def matching_rows(self, filters):
+        if not filters:
+            return np.arange(self.size)
+        return np.fromiter((row for row in range(self.size) if _matches(self.metadatas[row], filters)), dtype=np.int64)
+
+    def delete(self, filters, ids=None):
+        """
+        Removes the rows matching filters (all rows if filters is None) whose id is in ids (any id
+        if ids is None). Returns how many were removed.
+        """
+        keep = [row for row in range(self.size)
+                if (filters and not _matches(self.metadatas[row], filters)) or (ids is not None and self.ids[row] not in ids)]
+        removed = self.size - len(keep)
+        if removed:
+            self.vectors = np.asarray(self.vectors[keep], dtype=np.float32).reshape(-1, self.dimension)
+            self.ids = [self.ids[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self.size = len(keep)
+            self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        return removed
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process store. Vectors are partitioned by the partition_key metadata field (one segment
+    per document by default); each segment is a NumPy matrix of L2-normalised embeddings plus
+    its metadata, so cosine search is a matrix-vector product and a search filtered on the
+    partition key only touches that document's segment.
+    With a path, every segment persists to its own segments/<hash>.npy / .json pair, listed in
+    manifest.json. save() only rewrites the segments changed since the last save, segments are
+    opened lazily and memory-mapped (copied into RAM on first write), and refresh() only drops
+    the segments another process has saved a newer version of.
+    """
+
+    def __init__(self, path=None, dimension=EMBEDDING_DIMENSION, partition_key="doc_hash"):
+        self.path = path
+        self.dimension = dimension
+        self.partition_key = partition_key
+        self._segments = {} # partition -> _Segment, or None while not loaded from disk
+        self._saved = {} # partition -> {"count", "version"} as listed in the manifest
+        self._dirty = set()
+        self._loaded_version = None
+        if path:
+            self.refresh()
+            if self._loaded_version is None and os.path.exists(os.path.join(path, "vectors.npy")):
+                self._load_single_file_store()
+
+    def _load_single_file_store(self):
+        """Reads a store saved before segments existed (vectors.npy + metadata.json); the next save() converts it."""
+        vectors = np.load(os.path.join(self.path, "vectors.npy"))
+        with open(os.path.join(self.path, "metadata.json"), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        self.upsert(saved["ids"], vectors, saved["metadatas"])
+
+    def _partition(self, metadata):
+        value = metadata.get(self.partition_key)
+        return "" if value is None else str(value)
+
+    def _manifest_path(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def _segment_path(self, partition, extension):
+        name = hashlib.sha1(partition.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, "segments", name + extension)
+
+    def _saved_version(self):
+        try:
+            return os.stat(self._manifest_path()).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def refresh(self):
+        """Picks up segments saved by another process since the manifest was last read."""
+        version = self._saved_version()
+        if version is None or version == self._loaded_version:
+            return
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            saved = json.load(f)["segments"]
+        for partition in list(self._segments):
+            if partition not in saved and partition not in self._dirty:
+                del self._segments[partition]
+        for partition, entry in saved.items():
+            if partition in self._dirty:
+                continue
+            known = self._saved.get(partition)
+            if known is None or known["version"] != entry["version"] or partition not in self._segments:
+                self._segments[partition] = None # (re)loaded on first use
+        self._saved = saved
+        self._loaded_version = version
+
+    def _segment(self, partition):
+        """Returns a partition's segment, loading it from disk if needed (None if there is no such partition)."""
+        segment = self._segments.get(partition)
+        if segment is None and partition in self._segments:
+            vectors = np.load(self._segment_path(partition, ".npy"), mmap_mode="r")
+            with open(self._segment_path(partition, ".json"), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            segment = _Segment(self.dimension, vectors, saved["ids"], saved["metadatas"])
+            self._segments[partition] = segment
+        return segment
+
+    def save(self):
+        """Writes the segments changed since the last save (and removes deleted ones), then the manifest."""
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.join(self.path, "segments"), exist_ok=True)
+        for partition in self._dirty:
+            segment = self._segments.get(partition)
+            if segment is None:
+                self._saved.pop(partition, None)
+                for extension in (".npy", ".json"):
+                    if os.path.exists(self._segment_path(partition, extension)):
+                        os.remove(self._segment_path(partition, extension))
+                continue
+            vectors_path = self._segment_path(partition, ".npy")
+            metadata_path = self._segment_path(partition, ".json")
+            np.save(vectors_path[:-4] + ".tmp.npy", np.ascontiguousarray(segment.vectors[:segment.size]))
+            with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": segment.ids, "metadatas": segment.metadatas}, f)
+            os.replace(vectors_path[:-4] + ".tmp.npy", vectors_path)
+            os.replace(metadata_path + ".tmp", metadata_path)
+            self._saved[partition] = {"count": segment.size, "version": time.time_ns()}
+        tmp_manifest = self._manifest_path() + ".tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump({"segments": self._saved}, f)
+        os.replace(tmp_manifest, self._manifest_path())
+        for name in ("vectors.npy", "metadata.json"): # a converted single-file store
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        self._dirty.clear()
+        self._loaded_version = self._saved_version()
+
+    def upsert(self, ids, vectors, metadatas):
+        """Adds or replaces vectors. An id is unique within its partition."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        for vector_id, vector, metadata in zip(ids, vectors, metadatas):
+            partition = self._partition(metadata)
+            segment = self._segment(partition)
+            if segment is None:
+                segment = self._segments[partition] = _Segment(self.dimension)
+            segment.upsert(vector_id, vector, metadata)
+            self._dirty.add(partition)
+
+    def _candidate_partitions(self, filters):
+        """Partitions that can hold rows matching filters: just one when filtering on the partition key."""
+        if filters and self.partition_key in filters:
+            value = filters[self.partition_key]
+            partition = "" if value is None else str(value)
+            return [partition] if partition in self._segments else []
+        return list(self._segments)
+
+    def search(self, query_vector, top_k=5, filters=None):
+        if top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) or 1)
+        # The partition key is already handled by picking the segment, so only other keys need a scan
+        other_filters = {key: value for key, value in (filters or {}).items() if key != self.partition_key}
+
+        hits = []
+        for partition in self._candidate_partitions(filters):
+            segment = self._segment(partition)
+            rows = segment.matching_rows(other_filters)
+            if len(rows) == 0:
+                continue
+            scores = segment.vectors[rows] @ query
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            hits.extend(
+                {"id": segment.ids[rows[i]], "score": float(scores[i]), "metadata": segment.metadatas[rows[i]]}
+                for i in best
+            )
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[:top_k]
+
+    def delete(self, filters=None, ids=None):
+        """
+        Removes every vector whose metadata matches filters (all vectors if filters is None),
+        restricted to the given ids if there are any.
+        """
+        removed = 0
+        other_filters = {key: value for key, value in (filters or {}).items() if key != self.partition_key}
+        ids = set(ids) if ids is not None else None
+        for partition in self._candidate_partitions(filters):
+            if other_filters or ids is not None:
+                segment = self._segment(partition)
+                removed += segment.delete(other_filters, ids)
+                if segment.size:
+                    self._dirty.add(partition)
+                    continue
+            else:
+                removed += self._count(partition) # whole segment: dropped without reading it
+            del self._segments[partition]
+            self._dirty.add(partition)
+        return removed
+
+    def reset(self):
+        self.delete()
+        self.save()
+
+    def _count(self, partition):
+        # Segments not loaded yet are counted from the manifest
+        segment = self._segments.get(partition)
+        return segment.size if segment is not None else self._saved[partition]["count"]
+
+    def count(self):
+        return sum(self._count(partition) for partition in self._segments)
+
+
+class CosdataVectorStore(VectorStore):
+    """
+    Backend for a Cosdata server (see phase0_test.py). Cosdata's dense search has no metadata
+    filter, so filtered searches over-fetch (growing the fetch until enough results match) and
+    filter the results client-side.
+    """
+
+    OVERFETCH = 4
+    # Upper bound on the results one filtered search pulls from the server
+    MAX_FETCH = 2000
+
+    def __init__(self, collection_name, host="http://127.0.0.1:8443", username="admin", password="admin",
+                 dimension=EMBEDDING_DIMENSION):
+        from cosdata import Client
+        self.client = Client(host=host, username=username, password=password)
+        self.collection_name = collection_name
+        self.dimension = dimension
+        self.collection = self._get_or_create_collection()
+
+    def _get_or_create_collection(self):
+        try:
+            return self.client.get_collection(self.collection_name)
+        except Exception:
+            collection = self.client.create_collection(name=self.collection_name, dimension=self.dimension)
+            collection.create_index(distance_metric="cosine")
+            return collection
+
+    def upsert(self, ids, vectors, metadatas):
+        with self.collection.transaction() as txn:
+            for vector_id, vector, metadata in zip(ids, vectors, metadatas):
+                txn.upsert_vector({"id": vector_id, "dense_values": list(map(float, vector)), "metadata": metadata})
+
+    def search(self, query_vector, top_k=5, filters=None):
+        """
+        Filtered searches fetch top_k * OVERFETCH results and, while fewer than top_k of them
+        match, fetch OVERFETCH times more. They stop when the collection has no more results,
+        when a bigger fetch finds no new match (after the first ones were found), or at MAX_FETCH.
+        """
+        if top_k <= 0:
+            return []
+        query = list(map(float, query_vector))
+        fetch_k = min(top_k * self.OVERFETCH, self.MAX_FETCH) if filters else top_k
+        found = 0
+        while True:
+            results = self.collection.search.dense(query_vector=query, top_k=fetch_k).get("results", [])
+            hits = []
+            for res in results:
+                metadata = res.get("metadata") or {}
+                if _matches(metadata, filters):
+                    hits.append({"id": res.get("id"), "score": res.get("score"), "metadata": metadata})
+            if len(hits) >= top_k or len(results) < fetch_k or fetch_k >= self.MAX_FETCH or 0 < len(hits) == found:
+                break
+            found = len(hits)
+            fetch_k = min(fetch_k * self.OVERFETCH, self.MAX_FETCH)
+        if filters and len(hits) < top_k:
+            print(f"Cosdata search: only {len(hits)} of {top_k} requested results match {filters} "
+                  f"(searched {len(results)} vectors).")
+        return hits[:top_k]
+
+    def delete(self, filters=None, ids=None):
+        """
+        Deletes the given ids. The server can't select vectors by metadata, so a filtered delete
+        needs the ids (filters are then not checked); with neither, the whole collection is dropped.
+        Returns how many vectors were deleted.
+        """
+        if ids is None:
+            if filters:
+                raise ValueError("Cosdata can only delete vectors by id; pass the ids to delete.")
+            self.reset()
+            return None
+        import requests
+        client = self.collection.client
+        removed = 0
+        with self.collection.transaction() as txn:
+            for vector_id in ids:
+                # The SDK has no delete call yet, so this uses the server's transaction endpoint directly
+                url = (f"{client.base_url}/collections/{self.collection.name}"
+                       f"/transactions/{txn.transaction_id}/vectors/{vector_id}")
+                response = requests.delete(url, headers=client._get_headers(), verify=client.verify_ssl)
+                if response.status_code == 404:
+                    continue
+                if response.status_code not in (200, 204):
+                    raise RuntimeError(f"Failed to delete vector {vector_id}: {response.text}")
+                removed += 1
+        return removed
+
+    def reset(self):
+        try:
+            self.collection.delete()
+        except Exception:
+            pass
+        self.collection = self._get_or_create_collection()
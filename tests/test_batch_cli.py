@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+from main import checkpoint_path, find_pdfs, load_checkpoint
+
+
+def test_find_pdfs_walks_directories(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.pdf").write_bytes(b"%PDF")
+    (tmp_path / "sub" / "a.PDF").write_bytes(b"%PDF")
+    (tmp_path / "notes.txt").write_text("skip me")
+    assert find_pdfs(str(tmp_path)) == sorted([str(tmp_path / "b.pdf"), str(tmp_path / "sub" / "a.PDF")])
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# client archive\nfirst.pdf\n\n/abs/second.pdf\n")
+    assert find_pdfs(str(manifest)) == [str(tmp_path / "first.pdf"), "/abs/second.pdf"]
+
+
+def test_checkpoint_skips_done_documents_but_retries_failures(tmp_path):
+    output = tmp_path / "results.jsonl"
+    records = [{"path": "a.pdf", "status": "ok"}, {"path": "b.pdf", "status": "rejected"},
+               {"path": "c.pdf", "status": "failed"}]
+    # The last line was cut off by a crash
+    output.write_text("".join(json.dumps(r) + "\n" for r in records) + '{"path": "d.pd')
+    assert load_checkpoint(str(output)) == {"a.pdf", "b.pdf"}
+
+    # The first load wrote the light checkpoint file; later loads only read that
+    assert os.path.exists(checkpoint_path(str(output)))
+    output.write_text("not read any more")
+    assert load_checkpoint(str(output)) == {"a.pdf", "b.pdf"}
+
+
+PAGES = [{"page_num": 0, "text": "1. RENT\nThe Tenant shall pay rent monthly.\n", "method": "digital", "seconds": 0.0}]
+
+
+def _args(tmp_path, **overrides):
+    options = dict(output=str(tmp_path / "results.jsonl"), ocr_workers=1, skip_gatekeeper=False,
+                   no_embeddings=True, no_entities=True, llm_concurrency=1)
+    options.update(overrides)
+    return argparse.Namespace(**options)
+
+
+def test_gatekeeper_error_fails_the_batch_instead_of_the_run(tmp_path, monkeypatch):
+    def broken_gatekeeper(texts):
+        raise OSError("model download failed")
+
+    monkeypatch.setattr(main, "_extract", lambda path, ocr_workers: ("digest-" + path, PAGES))
+    monkeypatch.setattr("src.legal_doc_check.is_legal_documents", broken_gatekeeper)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        records = main.process_batch(["a.pdf", "b.pdf"], pool, _args(tmp_path))
+
+    assert [record["status"] for record in records] == ["failed", "failed"]
+    assert all("model download failed" in record["error"] for record in records)
+
+
+def test_embeddings_go_to_a_sidecar_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_extract", lambda path, ocr_workers: ("abc123", PAGES))
+    monkeypatch.setattr("src.embeddings.embed_texts", lambda texts: np.ones((len(texts), 4), dtype=np.float32))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        record, = main.process_batch(["a.pdf"], pool, _args(tmp_path, skip_gatekeeper=True, no_embeddings=False))
+
+    assert "text" not in record and all("embedding" not in chunk for chunk in record["chunks"])
+    vectors = np.load(tmp_path / record["embeddings"])
+    assert vectors.shape == (len(record["chunks"]), 4)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.chunking import chunk_text, chunk_pages
+
+CLAUSE = (
+    "{n}. PAYMENT TERMS\n"
+    "The Tenant shall pay rent of Rs. {n}000 on the first day of each month. Late payment attracts "
+    "interest at 2% per month. The Landlord may terminate on default.\n"
+    "(a) Notice shall be in writing.\n"
+    "(b) Disputes go to arbitration in Chandigarh.\n\n"
+)
+
+
+def make_pages(num_clauses=40, page_chars=2000):
+    text = "".join(CLAUSE.format(n=n) for n in range(1, num_clauses + 1))
+    return [{"page_num": p + 1, "text": text[start:start + page_chars]}
+            for p, start in enumerate(range(0, len(text), page_chars))]
+
+
+def test_chunks_start_on_clauses_and_respect_the_size():
+    chunks = chunk_pages(make_pages(), chunk_size=1000)
+    assert len(chunks) > 1
+    assert all(len(chunk["text"]) <= 1000 for chunk in chunks)
+    assert all(chunk["text"].split(".")[0].isdigit() for chunk in chunks)
+
+
+def test_offsets_and_pages_point_back_into_the_document():
+    pages = make_pages()
+    text = "".join(page["text"] for page in pages)
+    chunks = chunk_pages(pages, chunk_size=1000)
+    for chunk in chunks:
+        assert text[chunk["char_start"]:chunk["char_end"]] == chunk["text"]
+        assert chunk["page_start"] == chunk["char_start"] // 2000 + 1
+        assert chunk["page_end"] == (chunk["char_end"] - 1) // 2000 + 1
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_prose_without_clauses_overlaps_on_sentences():
+    text = " ".join(f"Sentence number {i} of the judgment is here." for i in range(100))
+    chunks = chunk_text(text, chunk_size=300, overlap=100)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["text"].startswith("Sentence number")
+        assert chunk["char_start"] < previous["char_end"] # overlapping
+        assert chunk["char_start"] > previous["char_start"]
+
+
+def test_unbreakable_text_is_hard_cut():
+    chunks = chunk_text("x" * 2500, chunk_size=1000)
+    assert [len(chunk["text"]) for chunk in chunks] == [1000, 1000, 500]
+    assert chunk_text("   ") == []
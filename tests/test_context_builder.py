@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import cosdata_store
+from src.information_extraction import extractor
+from src.information_extraction.context_builder import count_tokens, format_context, merge_chunks, pack_context
+from src.information_extraction.llm_client import FakeBackend
+from src.information_extraction.response_cache import ResponseCache
+
+DOCUMENT = "".join(f"{n}. Clause number {n} of the lease says something important. " for n in range(1, 60))
+
+
+def chunk(start, end, page=0):
+    return {"text": DOCUMENT[start:end], "char_start": start, "char_end": end, "page_start": page, "page_end": page}
+
+
+def test_overlapping_chunks_merge_without_repeating_text():
+    blocks = merge_chunks([chunk(100, 300), chunk(0, 150)])
+    assert len(blocks) == 1
+    assert blocks[0]["text"] == DOCUMENT[0:300]
+
+
+def test_touching_chunks_merge_only_on_the_same_page():
+    assert len(merge_chunks([chunk(0, 100, page=0), chunk(100, 200, page=0)])) == 1
+    assert len(merge_chunks([chunk(0, 100, page=0), chunk(100, 200, page=1)])) == 2
+
+
+def test_duplicate_boilerplate_is_dropped():
+    boilerplate = {"text": "This page is intentionally left blank."}
+    assert len(merge_chunks([boilerplate, dict(boilerplate)])) == 1
+
+
+def test_packing_respects_the_budget_in_ranking_order():
+    ranked = [chunk(2000, 2400), chunk(0, 400), chunk(1000, 1400), chunk(390, 500)]
+    blocks = pack_context(ranked, token_budget=250)
+    assert count_tokens(format_context(blocks)) <= 250
+    # The third chunk doesn't fit; the fourth does once merged into the second, and blocks come in document order
+    assert [(block["char_start"], block["char_end"]) for block in blocks] == [(0, 500), (2000, 2400)]
+
+
+def test_top_chunk_is_kept_even_if_too_big():
+    blocks = pack_context([chunk(0, 2000)], token_budget=100)
+    assert len(blocks) == 1
+    assert count_tokens(blocks[0]["text"]) <= 100
+
+
+def test_oversized_top_chunk_is_cut_not_skipped():
+    top, small = chunk(0, 3000), chunk(3200, 3300, page=1)
+    blocks = pack_context([top, small], token_budget=500)
+    assert count_tokens(format_context(blocks)) <= 500
+    # The top chunk fills the budget (cut), instead of the lower-ranked chunk taking its place
+    assert len(blocks) == 1
+    assert (blocks[0]["char_start"], blocks[0]["page_start"]) == (0, 0)
+    assert blocks[0]["text"] == DOCUMENT[0:blocks[0]["char_end"]]
+    assert len(blocks[0]["text"]) > 1500
+
+
+def test_answer_prompt_stays_within_budget(monkeypatch):
+    ranked = [chunk(i * 300, i * 300 + 400) for i in range(8)]
+    monkeypatch.setattr(cosdata_store, "search_chunks", lambda *args, **kwargs: ranked)
+    backend = FakeBackend(reply="The rent is due monthly.")
+    monkeypatch.setattr(extractor, "_gateway", None) # restored after the test
+    extractor.set_llm_backend(backend)
+    monkeypatch.setattr(extractor, "response_cache", ResponseCache())
+
+    assert extractor.answer_user_questions("When is rent due?", "s", "lease.pdf", "hash", max_prompt_tokens=900) \
+        == "The rent is due monthly."
+    assert count_tokens(backend.calls[0]) <= 900
+    assert "[Page 1]" in backend.calls[0]
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.embeddings import embed_texts
+
+
+class FakeModel:
+    """Stands in for SentenceTransformer: a text's vector is [len(text), number of words, 1]."""
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        self.encoded.append(list(texts))
+        return np.array([[len(text), len(text.split()), 1] for text in texts], dtype=np.float32)
+
+
+def test_duplicates_are_encoded_once_and_rows_keep_input_order(tmp_path):
+    model = FakeModel()
+    texts = ["rent is due", "notice", "rent is due", "governing law of India"]
+
+    vectors = embed_texts(texts, model=model, cache_path=str(tmp_path / "cache.sqlite3"))
+
+    assert model.encoded == [["rent is due", "notice", "governing law of India"]]
+    assert vectors.shape == (4, 3) and vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [len(text) for text in texts]
+
+
+def test_second_call_is_served_from_the_cache(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite3")
+    first = embed_texts(["rent is due", "notice"], model=FakeModel(), cache_path=cache_path)
+
+    model = FakeModel()
+    second = embed_texts(["notice", "new clause", "rent is due"], model=model, cache_path=cache_path)
+
+    assert model.encoded == [["new clause"]]
+    assert np.array_equal(second[0], first[1]) and np.array_equal(second[2], first[0])
+
+
+def test_cache_is_keyed_by_model_and_can_be_skipped(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite3")
+    embed_texts(["notice"], model=FakeModel(), cache_path=cache_path)
+
+    other = FakeModel()
+    other.model_name = "other-model"
+    embed_texts(["notice"], model=other, cache_path=cache_path)
+    uncached = FakeModel()
+    embed_texts(["notice"], model=uncached, use_cache=False, cache_path=cache_path)
+
+    assert other.encoded == [["notice"]]
+    assert uncached.encoded == [["notice"]]
+
+
+def test_empty_input_returns_an_empty_array(tmp_path):
+    model = FakeModel()
+    assert embed_texts([], model=model, cache_path=str(tmp_path / "cache.sqlite3")).shape == (0, 0)
+    assert model.encoded == []
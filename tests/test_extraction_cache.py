@@ -0,0 +1,75 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import extraction_cache
+from src.extraction_cache import file_sha256, get_cached, put_cached, cache_stats
+
+
+def test_same_bytes_give_same_key(tmp_path):
+    first = tmp_path / "a.pdf"
+    second = tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 same bytes")
+    second.write_bytes(b"%PDF-1.4 same bytes")
+    assert file_sha256(first) == file_sha256(second)
+
+
+def test_hit_miss_and_version(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    pages = [{"page_num": 0, "text": "hello", "method": "digital", "seconds": 0.0}]
+    before = cache_stats()
+
+    assert get_cached("pages", "abc", "v1", cache_dir) is None
+    put_cached("pages", "abc", "v1", pages, cache_dir)
+    assert get_cached("pages", "abc", "v1", cache_dir) == pages
+    # A new pipeline version must not reuse the old entry
+    assert get_cached("pages", "abc", "v2", cache_dir) is None
+
+    after = cache_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 2
+
+
+def test_lru_eviction(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    put_cached("pages", "old", "v1", "x" * 100, cache_dir)
+    put_cached("pages", "new", "v1", "y" * 100, cache_dir)
+    old_path = extraction_cache._entry_path("pages", "old", "v1", cache_dir)
+    os.utime(old_path, (1, 1)) # make "old" the least recently used entry
+
+    put_cached("pages", "newest", "v1", "z" * 100, cache_dir, max_bytes=250)
+
+    assert get_cached("pages", "old", "v1", cache_dir) is None
+    assert get_cached("pages", "newest", "v1", cache_dir) == "z" * 100
+
+
+def test_put_only_scans_the_directory_when_over_the_limit(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    scans = []
+    original_evict = extraction_cache.evict
+
+    def counting_evict(directory, max_bytes):
+        scans.append(directory)
+        return original_evict(directory, max_bytes)
+
+    monkeypatch.setattr(extraction_cache, "evict", counting_evict)
+    for n in range(5):
+        put_cached("pages", f"doc{n}", "v1", "x" * 100, cache_dir, max_bytes=1000)
+    assert len(scans) == 1 # the first put measures the directory; the rest fit in the estimate
+
+    put_cached("pages", "big", "v1", "y" * 600, cache_dir, max_bytes=1000)
+    assert len(scans) == 2
+    assert get_cached("pages", "doc0", "v1", cache_dir) is None # least recently used, evicted
+    assert get_cached("pages", "big", "v1", cache_dir) == "y" * 600
+
+
+def test_hit_survives_the_entry_being_evicted_after_the_read(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    put_cached("pages", "abc", "v1", ["page"], cache_dir)
+
+    def vanished(path, times=None):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(extraction_cache.os, "utime", vanished)
+    assert get_cached("pages", "abc", "v1", cache_dir) == ["page"]
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import analysis, cosdata_store
+from src.information_extraction import extractor
+from src.information_extraction.llm_client import FakeBackend
+from src.information_extraction.response_cache import ResponseCache
+
+SECTIONS = [f"{n}. Clause {n}: the tenant shall pay rent on time.\n" + "Filler words. " * 20 + "\n" for n in range(1, 7)]
+DOCUMENT = "".join(SECTIONS)
+
+
+def _use_backend(monkeypatch, backend):
+    monkeypatch.setattr(extractor, "_gateway", None) # restored after the test
+    extractor.set_llm_backend(backend, requests_per_minute=6000, max_retries=0, backoff_seconds=0.01)
+
+
+def test_split_into_sections_cuts_on_clause_boundaries():
+    chunks = extractor.split_into_sections(DOCUMENT, max_chars=len(SECTIONS[0]) * 2 + 10)
+    assert "".join(chunks) == DOCUMENT
+    assert len(chunks) == 3
+    assert all(chunk.startswith(("1.", "3.", "5.")) for chunk in chunks)
+
+
+def test_split_into_sections_cuts_an_oversized_section():
+    text = ("a" * 60 + "\n\n") * 5
+    chunks = extractor.split_into_sections(text, max_chars=100)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
+def test_merge_extractions_drops_duplicates():
+    merged = extractor.merge_extractions([
+        {"entities": {"dates": ["1 May 2024", "2 June 2024"]}, "clauses": [{"clause_text": "Rent is due monthly."}]},
+        {"entities": {"dates": ["1  may 2024"], "individual_names": "Asha Rao"},
+         "clauses": [{"clause_text": "rent is due   monthly."}, {"clause_text": "Either party may terminate."}]},
+    ])
+    assert merged["entities"]["dates"] == ["1 May 2024", "2 June 2024"]
+    assert merged["entities"]["individual_names"] == ["Asha Rao"]
+    assert [clause["clause_text"] for clause in merged["clauses"]] == ["Rent is due monthly.", "Either party may terminate."]
+
+
+def test_all_chunks_failing_raises(monkeypatch):
+    monkeypatch.setattr(extractor, "EXTRACTION_CHUNK_CHARS", 400)
+    _use_backend(monkeypatch, FakeBackend(failures=100))
+    with pytest.raises(RuntimeError):
+        extractor.extract_entities_with_llm(DOCUMENT)
+
+
+def test_partial_failure_is_reported_and_not_cached(tmp_path, monkeypatch):
+    def handler(prompt):
+        if "Clause 1:" in prompt:
+            raise RuntimeError("quota exceeded")
+        return json.dumps({"entities": {"dates": ["1 May 2024"]}, "clauses": []})
+
+    monkeypatch.setattr(extractor, "EXTRACTION_CHUNK_CHARS", 400)
+    monkeypatch.setattr("src.extraction_cache.CACHE_DIR", str(tmp_path / "cache"))
+    _use_backend(monkeypatch, FakeBackend(handler=handler))
+
+    llm_output, failed_chunks = extractor.extract_entities_with_llm(DOCUMENT)
+    assert failed_chunks == 1
+    assert json.loads(llm_output)["entities"]["dates"] == ["1 May 2024"]
+
+    data, _, error, _ = analysis.extract_analysis(DOCUMENT, "digest")
+    assert data["entities"]["dates"] == ["1 May 2024"]
+    assert "incomplete" in error
+    assert analysis.get_cached("analysis", "digest", extractor.MODEL_NAME) is None
+
+
+def test_streamed_answer_is_cached_whole(monkeypatch):
+    context = {"text": "1. Rent is due monthly.", "char_start": 0, "char_end": 23, "page_start": 0, "page_end": 0}
+    monkeypatch.setattr(cosdata_store, "search_chunks", lambda *args, **kwargs: [context])
+    monkeypatch.setattr(extractor, "response_cache", ResponseCache())
+    backend = FakeBackend(reply="The rent is due monthly.")
+    _use_backend(monkeypatch, backend)
+
+    deltas = list(extractor.stream_user_answer("When is rent due?", "s", "lease.pdf", "hash"))
+    assert len(deltas) > 1
+    assert "".join(deltas) == "The rent is due monthly."
+    # The second time the whole answer comes from the cache, without an LLM call
+    assert list(extractor.stream_user_answer("When is rent due?", "s", "lease.pdf", "hash")) == ["The rent is due monthly."]
+    assert len(backend.calls) == 1
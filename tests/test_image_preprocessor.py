@@ -0,0 +1,61 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ocr_processing.image_preprocessor import (
+    estimate_skew, choose_threshold_method, crop_margins, normalize_dpi, preprocess_image,
+)
+
+
+def make_page():
+    """A4 page at 150 DPI with 30 lines of black text."""
+    page = np.full((1754, 1240), 255, np.uint8)
+    for i in range(30):
+        cv2.putText(page, f"This Agreement is made between the parties {i}", (150, 200 + i * 45),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return page
+
+
+def rotate(img, angle):
+    h, w = img.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(img, matrix, (w, h), borderValue=255)
+
+
+def test_skew_estimate_undoes_the_rotation():
+    assert abs(estimate_skew(rotate(make_page(), 3)) + 3) <= 0.3
+    assert abs(estimate_skew(make_page())) < 0.3
+
+
+def test_uneven_lighting_switches_to_adaptive_threshold():
+    page = make_page()
+    shadow = np.tile(np.linspace(0.45, 1, page.shape[1]), (page.shape[0], 1))
+    assert choose_threshold_method(page) == "otsu"
+    assert choose_threshold_method((page * shadow).astype(np.uint8)) == "adaptive"
+
+
+def test_dpi_normalization_only_downscales_when_dpi_is_guessed():
+    page = make_page()
+    assert normalize_dpi(page, source_dpi=150, target_dpi=300).shape == (3508, 2480)
+    assert normalize_dpi(page, target_dpi=300).shape == page.shape
+    assert normalize_dpi(page, target_dpi=100).shape[0] < page.shape[0]
+
+
+def test_crop_ignores_scanner_borders():
+    page = make_page()
+    page[:, :20] = 0 # black strip left by the scanner lid
+    cropped = crop_margins(page)
+    assert cropped.shape[0] < page.shape[0] - 100
+    assert cropped.shape[1] < page.shape[1] - 100
+    assert cropped[:, :5].min() == 255
+
+
+def test_legacy_settings_match_plain_otsu():
+    page = make_page()
+    _, expected = cv2.threshold(page, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    result = preprocess_image(page, target_dpi=None, deskew_page=False, threshold="otsu", denoise=False, crop=False)
+    assert np.array_equal(result, expected)
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import cosdata_store, index_registry, keyword_index
+from src.vector_store import LocalVectorStore
+
+TEXT = "1. RENT\nThe Tenant shall pay rent monthly.\n\n2. NOTICE\nEither party may terminate with notice.\n"
+
+
+@pytest.fixture
+def shared_index(tmp_path, monkeypatch):
+    """A shared local collection, keyword indexes and registry under tmp_path; counts embedded chunks."""
+    store = LocalVectorStore(str(tmp_path / "vectors"), dimension=3)
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+    monkeypatch.setattr(cosdata_store, "_store", store)
+    monkeypatch.setattr(cosdata_store, "VECTOR_STORE_DIR", str(tmp_path / "vectors"))
+    monkeypatch.setattr(cosdata_store, "embed_texts", fake_embed)
+    monkeypatch.setattr(keyword_index, "KEYWORD_INDEX_DIR", str(tmp_path / "keywords"))
+    monkeypatch.setattr(index_registry, "INDEX_REGISTRY_PATH", str(tmp_path / "registry.sqlite3"))
+    return store, embedded
+
+
+def test_second_session_reuses_the_indexed_document(shared_index):
+    store, embedded = shared_index
+    first = cosdata_store.index_document(TEXT, "s1", "lease.pdf", doc_hash="h1")
+    second = cosdata_store.index_document(TEXT, "s2", "copy of lease.pdf", doc_hash="h1")
+
+    assert first == second == store.count()
+    assert len(embedded) == first # embedded once
+    assert index_registry.refcount("h1") == 2
+
+
+def test_document_is_dropped_with_its_last_reference(shared_index):
+    store, _ = shared_index
+    cosdata_store.index_document(TEXT, "s1", "lease.pdf", doc_hash="h1")
+    cosdata_store.index_document(TEXT, "s2", "lease.pdf", doc_hash="h1")
+
+    assert cosdata_store.release_document("s1", "h1") == []
+    assert store.count() > 0
+    assert cosdata_store.release_document("s2") == ["h1"]
+    assert store.count() == 0
+    assert keyword_index.load_index("h1") == (None, {})
+    assert not index_registry.is_indexed("h1")
+
+
+def test_idle_sessions_expire_but_active_ones_keep_their_documents(shared_index):
+    store, _ = shared_index
+    cosdata_store.index_document(TEXT, "idle", "a.pdf", doc_hash="h1")
+    time.sleep(0.05)
+    cosdata_store.index_document(TEXT + "3. TERM\nOne year.\n", "active", "b.pdf", doc_hash="h2")
+
+    assert cosdata_store.collect_garbage(ttl=0.02) == ["h1"]
+    assert index_registry.is_indexed("h2")
+    assert {hit["metadata"]["doc_hash"] for hit in store.search([1, 1, 1], top_k=10)} == {"h2"}
+
+
+def test_garbage_collection_deletes_the_document_chunk_ids(shared_index, monkeypatch):
+    store, _ = shared_index
+    count = cosdata_store.index_document(TEXT, "s1", "lease.pdf", doc_hash="h1")
+    deleted = []
+    original_delete = store.delete
+
+    def recording_delete(filters=None, ids=None):
+        deleted.append((filters, list(ids)))
+        return original_delete(filters, ids)
+
+    monkeypatch.setattr(store, "delete", recording_delete)
+    assert cosdata_store.release_document("s1") == ["h1"]
+    assert deleted == [({"doc_hash": "h1"}, cosdata_store.chunk_ids("h1", count))]
+    assert store.count() == 0
+
+
+def test_collection_skips_a_document_reattached_after_listing(shared_index, monkeypatch):
+    store, _ = shared_index
+    cosdata_store.index_document(TEXT, "s1", "lease.pdf", doc_hash="h1")
+    index_registry.detach("s1")
+    listed = index_registry.unreferenced_documents()
+
+    def listing_then_attach():
+        # A session picks the document up again between the listing and the removal
+        index_registry.attach("s2", "h1", "lease.pdf")
+        return listed
+
+    monkeypatch.setattr(index_registry, "unreferenced_documents", listing_then_attach)
+    assert cosdata_store.collect_garbage() == []
+    assert index_registry.is_indexed("h1")
+    assert store.count() > 0
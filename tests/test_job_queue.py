@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import job_queue
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _set_running(db_path, job_id, pid, updated_at):
+    conn = job_queue._connect(db_path)
+    try:
+        conn.execute("UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? WHERE id = ?",
+                     (pid, updated_at, job_id))
+    finally:
+        conn.close()
+
+
+def test_claim_next_job_takes_the_oldest_once(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    first = job_queue.submit_job("analyze_document", {"n": 1}, db_path)
+    second = job_queue.submit_job("analyze_document", {"n": 2}, db_path)
+
+    job = job_queue.claim_next_job(db_path)
+    assert job["id"] == first
+    assert job["status"] == "running" and job["worker_pid"] == os.getpid()
+    assert job_queue.claim_next_job(db_path)["id"] == second
+    assert job_queue.claim_next_job(db_path) is None
+
+
+def test_run_job_records_progress_result_and_errors(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    def handler(payload, progress):
+        progress("working", 0.5)
+        if payload.get("fail"):
+            raise ValueError("bad document")
+        return {"echo": payload["n"]}
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "test", handler)
+    ok = job_queue.submit_job("test", {"n": 7}, db_path)
+    failed = job_queue.submit_job("test", {"n": 8, "fail": True}, db_path)
+
+    job_queue.run_job(job_queue.claim_next_job(db_path), db_path)
+    job_queue.run_job(job_queue.claim_next_job(db_path), db_path)
+
+    done = job_queue.get_job(ok, db_path)
+    assert (done["status"], done["progress"], done["result"]) == ("done", 1.0, {"echo": 7})
+    error = job_queue.get_job(failed, db_path)
+    assert (error["status"], error["progress"], error["error"]) == ("failed", 0.5, "bad document")
+
+
+def test_heartbeat_keeps_a_long_job_fresh(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(job_queue, "HEARTBEAT_SECONDS", 0.05)
+    seen = []
+
+    def handler(payload, progress):
+        started = job_queue.get_job(job_id, db_path)["updated_at"]
+        time.sleep(0.3)
+        seen.append(job_queue.get_job(job_id, db_path)["updated_at"] > started)
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "test", handler)
+    job_id = job_queue.submit_job("test", {}, db_path)
+    job_queue.run_job(job_queue.claim_next_job(db_path), db_path)
+    assert seen == [True]
+
+
+def test_requeue_stale_jobs_checks_heartbeat_and_worker(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    live_pid = os.getppid() # any process that is still running, other than this one
+    fresh = job_queue.submit_job("test", {}, db_path)
+    dead = job_queue.submit_job("test", {}, db_path)
+    silent = job_queue.submit_job("test", {}, db_path)
+    _set_running(db_path, fresh, live_pid, time.time())
+    _set_running(db_path, dead, _dead_pid(), time.time())
+    _set_running(db_path, silent, live_pid, time.time() - 3600)
+
+    assert job_queue.requeue_stale_jobs(max_age=60, db_path=db_path) == 2
+    assert job_queue.get_job(fresh, db_path)["status"] == "running"
+    for job_id in (dead, silent):
+        job = job_queue.get_job(job_id, db_path)
+        assert (job["status"], job["worker_pid"]) == ("queued", None)
+
+
+def test_a_job_that_keeps_killing_its_worker_is_failed(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    job_id = job_queue.submit_job("test", {}, db_path)
+
+    for attempt in range(1, job_queue.MAX_JOB_ATTEMPTS + 1):
+        job = job_queue.claim_next_job(db_path)
+        assert (job["id"], job["attempts"]) == (job_id, attempt)
+        _set_running(db_path, job_id, _dead_pid(), time.time()) # the worker crashed mid-job
+        job_queue.requeue_stale_jobs(db_path=db_path)
+
+    job = job_queue.get_job(job_id, db_path)
+    assert job["status"] == "failed"
+    assert "3 times" in job["error"]
+    assert job_queue.claim_next_job(db_path) is None
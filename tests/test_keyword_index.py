@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import cosdata_store, keyword_index, index_registry
+from src.keyword_index import BM25Index, reciprocal_rank_fusion, tokenize
+from src.vector_store import LocalVectorStore
+
+CHUNKS = {
+    "c1": "The accused is charged u/s 420 of the Indian Penal Code for cheating.",
+    "c2": "The tenant shall pay rent on the first day of each month.",
+    "c3": "Cheating and dishonest inducement are punishable offences.",
+}
+
+
+def test_tokenizer_keeps_section_numbers_and_joined_terms():
+    assert tokenize("Charged u/s 420 IPC, see clause 12.3 (non-compete).") == [
+        "charged", "u/s", "420", "ipc", "see", "clause", "12.3", "non-compete"]
+
+
+def test_bm25_finds_exact_section_number():
+    index = BM25Index(list(CHUNKS), list(CHUNKS.values()))
+    hits = index.search("what does u/s 420 mean?", top_k=3)
+    assert hits[0][0] == "c1"
+    assert index.search("arbitration") == []
+
+
+def test_rrf_weight_decides_between_the_rankings():
+    dense, keyword = ["a", "b", "c"], ["c", "b", "a"]
+    assert reciprocal_rank_fusion([dense, keyword], weights=[0.9, 0.1])[0] == "a"
+    assert reciprocal_rank_fusion([dense, keyword], weights=[0.1, 0.9])[0] == "c"
+
+
+def test_hybrid_search_surfaces_keyword_only_hit(tmp_path, monkeypatch):
+    # Dense search ranks the rent chunk first; the question's section number only matches c1
+    store = LocalVectorStore(dimension=2)
+    vectors = {"c1": [0, 1], "c2": [1, 0], "c3": [0.7, 0.7]}
+    metadatas = [{"doc_hash": "h", "text": text} for text in CHUNKS.values()]
+    store.upsert(list(CHUNKS), [vectors[chunk_id] for chunk_id in CHUNKS], metadatas)
+    monkeypatch.setattr(cosdata_store, "_store", store)
+    monkeypatch.setattr(cosdata_store, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(cosdata_store, "embed_query", lambda question: [1, 0])
+    monkeypatch.setattr(keyword_index, "KEYWORD_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(index_registry, "INDEX_REGISTRY_PATH", str(tmp_path / "registry.sqlite3"))
+    keyword_index.save_index("h", BM25Index(list(CHUNKS), list(CHUNKS.values())), dict(zip(CHUNKS, metadatas)))
+
+    assert cosdata_store.query_cosdata("u/s 420", "s", "h", top_k=1, keyword_weight=0) == [CHUNKS["c2"]]
+    assert cosdata_store.query_cosdata("u/s 420", "s", "h", top_k=1, keyword_weight=0.7) == [CHUNKS["c1"]]
+
+
+def test_loaded_indexes_are_bounded_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(keyword_index, "_cache", keyword_index.OrderedDict())
+    monkeypatch.setattr(keyword_index, "KEYWORD_INDEX_CACHE_SIZE", 2)
+    index_dir = str(tmp_path / "keywords")
+    for key in ["a", "b", "c"]:
+        keyword_index.save_index(key, BM25Index(["c1"], [CHUNKS["c1"]]), {"c1": {"text": key}}, index_dir)
+    assert len(keyword_index._cache) == 2 # "a" was dropped
+
+    keyword_index.load_index("b", index_dir) # "b" is now the most recently used
+    index, metadatas = keyword_index.load_index("a", index_dir) # re-read from disk, evicts "c"
+
+    assert metadatas == {"c1": {"text": "a"}} and index.search("420")
+    cached = [keyword_index._index_path(key, index_dir) for key in ["b", "a"]]
+    assert list(keyword_index._cache) == cached
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.information_extraction.llm_client import FakeBackend, LLMGateway, SimulatedFailure, is_retryable
+
+
+def test_identical_prompts_are_coalesced():
+    backend = FakeBackend(handler=lambda prompt: prompt.upper(), delay=0.05)
+    gateway = LLMGateway(backend, requests_per_minute=6000)
+
+    results = gateway.generate_many_sync(["same", "same", "other"])
+
+    assert results == ["SAME", "SAME", "OTHER"]
+    assert len(backend.calls) == 2
+    assert gateway.stats["coalesced"] == 1
+
+
+def test_retries_with_backoff_then_succeeds():
+    backend = FakeBackend(reply="ok", failures=2)
+    gateway = LLMGateway(backend, requests_per_minute=6000, backoff_seconds=0.01)
+
+    assert gateway.generate_sync("prompt") == "ok"
+    assert gateway.stats["retries"] == 2
+
+
+def test_client_errors_are_raised_without_retrying():
+    backend = FakeBackend(reply="ok", failures=1, failure_status=400)
+    gateway = LLMGateway(backend, requests_per_minute=6000, backoff_seconds=0.01)
+
+    with pytest.raises(SimulatedFailure):
+        gateway.generate_sync("prompt")
+    assert len(backend.calls) == 1
+    assert gateway.stats["retries"] == 0 and gateway.stats["failures"] == 1
+
+
+def test_only_timeouts_rate_limits_and_server_errors_are_retryable():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(SimulatedFailure(429)) and is_retryable(SimulatedFailure(503))
+    assert not is_retryable(SimulatedFailure(403))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_timeout_is_raised_after_retries():
+    backend = FakeBackend(reply="slow", delay=1.0)
+    gateway = LLMGateway(backend, timeout=0.01, max_retries=1, backoff_seconds=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        gateway.generate_sync("prompt")
+    assert gateway.stats["failures"] == 1
+
+
+def test_concurrency_is_capped():
+    running = {"now": 0, "peak": 0}
+
+    class CountingBackend(FakeBackend):
+        async def generate(self, prompt):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.02)
+            running["now"] -= 1
+            return prompt
+
+    gateway = LLMGateway(CountingBackend(), max_concurrency=2, requests_per_minute=6000)
+    gateway.generate_many_sync([f"p{i}" for i in range(6)])
+
+    assert running["peak"] == 2
+
+
+def test_stream_yields_deltas_and_retries_before_the_first_one():
+    backend = FakeBackend(reply="The rent is due monthly.", failures=1)
+    gateway = LLMGateway(backend, requests_per_minute=6000, backoff_seconds=0.01)
+
+    deltas = list(gateway.stream_sync("prompt"))
+
+    assert deltas == ["The ", "rent ", "is ", "due ", "monthly."]
+    assert gateway.stats["retries"] == 1
+
+
+def test_stream_without_backend_support_yields_one_delta():
+    class BlockingBackend:
+        async def generate(self, prompt):
+            return "whole answer"
+
+    gateway = LLMGateway(BlockingBackend(), requests_per_minute=6000)
+    assert list(gateway.stream_sync("prompt")) == ["whole answer"]
+
+
+def test_stream_raises_client_errors_without_retrying():
+    backend = FakeBackend(reply="The rent is due monthly.", failures=1, failure_status=401)
+    gateway = LLMGateway(backend, requests_per_minute=6000, backoff_seconds=0.01)
+
+    with pytest.raises(SimulatedFailure):
+        list(gateway.stream_sync("prompt"))
+    assert len(backend.calls) == 1
+    assert gateway.stats["retries"] == 0
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import model_registry
+
+
+def test_preload_loads_registered_models_once_and_warns_on_unknown(monkeypatch, capsys):
+    monkeypatch.setattr(model_registry, "_models", {})
+    loads = []
+    model_registry.register("tiny", lambda: loads.append(1) or "model")
+
+    model_registry.preload(["tiny", "missing"])
+    model_registry.preload(["tiny"])
+
+    assert loads == [1]
+    assert model_registry.get("tiny") == "model"
+    assert model_registry.status()["tiny"]["state"] == "ready"
+    assert "missing" in capsys.readouterr().out
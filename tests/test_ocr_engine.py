@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ocr_processing import ocr_engine
+from src.ocr_processing.image_to_text import extract_text_from_image
+from src.ocr_processing.image_preprocessor import TARGET_DPI
+
+
+class RecordingEngine:
+    name = "recording"
+
+    def __init__(self):
+        self.calls = []
+
+    def image_to_text(self, image, dpi=None):
+        self.calls.append((image.shape, dpi))
+        return "THE TENANT SHALL PAY RENT"
+
+    def close(self):
+        pass
+
+
+def test_pytesseract_config_carries_psm_oem_and_dpi():
+    engine = ocr_engine.create_engine("pytesseract", lang="eng+hin", psm=6, oem=1)
+    assert engine.lang == "eng+hin"
+    assert engine.config() == "--psm 6 --oem 1"
+    assert engine.config(300) == "--psm 6 --oem 1 --dpi 300"
+
+
+def test_auto_falls_back_without_tesserocr(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tesserocr", None) # makes `import tesserocr` raise ImportError
+    assert ocr_engine.create_engine("auto").name == "pytesseract"
+
+
+def test_pages_go_through_the_shared_engine(monkeypatch):
+    engine = RecordingEngine()
+    monkeypatch.setattr(ocr_engine, "_engine", engine)
+    page = np.full((400, 300), 255, np.uint8)
+    assert extract_text_from_image(page, source_dpi=TARGET_DPI) == "the tenant shall pay rent"
+    assert extract_text_from_image(page) == "the tenant shall pay rent"
+    assert [dpi for _, dpi in engine.calls] == [TARGET_DPI, None]
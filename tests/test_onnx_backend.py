@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.onnx_backend import classifier_parity
+
+LABELS = ["legal document", "invoice"]
+TEMPLATE = "This document is a {}."
+
+
+def fake_pipeline(scores_by_text):
+    """Zero-shot pipeline stand-in returning the given (legal, invoice) scores, best label first."""
+    calls = []
+
+    def classify(text, labels, hypothesis_template=None):
+        calls.append((text, tuple(labels), hypothesis_template))
+        ranked = sorted(zip(labels, scores_by_text[text]), key=lambda pair: pair[1], reverse=True)
+        return {"labels": [label for label, _ in ranked], "scores": [score for _, score in ranked]}
+
+    classify.calls = calls
+    return classify
+
+
+def test_identical_pipelines_fully_agree():
+    scores = {"lease": (0.9, 0.1), "bill": (0.2, 0.8)}
+    reference, candidate = fake_pipeline(scores), fake_pipeline(dict(scores))
+
+    report = classifier_parity(reference, candidate, ["lease", "bill"], LABELS, TEMPLATE)
+
+    assert report == {"texts": 2, "top_label_agreement": 1.0, "mismatches": [], "max_score_diff": 0.0}
+    assert candidate.calls == reference.calls == [("lease", tuple(LABELS), TEMPLATE), ("bill", tuple(LABELS), TEMPLATE)]
+
+
+def test_disagreements_are_counted_and_listed():
+    reference = fake_pipeline({"lease": (0.9, 0.1), "bill": (0.2, 0.8), "memo": (0.6, 0.4)})
+    candidate = fake_pipeline({"lease": (0.85, 0.15), "bill": (0.2, 0.8), "memo": (0.3, 0.7)})
+
+    report = classifier_parity(reference, candidate, ["lease", "bill", "memo"], LABELS, TEMPLATE)
+
+    assert report["top_label_agreement"] == pytest.approx(2 / 3)
+    assert report["mismatches"] == [2]
+    assert report["max_score_diff"] == pytest.approx(0.3)
+
+
+def test_no_texts_counts_as_agreement():
+    report = classifier_parity(fake_pipeline({}), fake_pipeline({}), [], LABELS, TEMPLATE)
+    assert report["top_label_agreement"] == 1.0 and report["mismatches"] == []
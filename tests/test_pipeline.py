@@ -0,0 +1,71 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import pipeline
+
+
+def _scanned_pdf(path, pages=2):
+    """A PDF whose pages have no text layer, so every page is routed to OCR."""
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def test_iter_pdf_pages_reuses_the_ocr_pool(tmp_path, monkeypatch):
+    created = []
+
+    def fake_pool(max_workers=None, initializer=None, mp_context=None):
+        created.append((max_workers, mp_context.get_start_method()))
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr("concurrent.futures.ProcessPoolExecutor", fake_pool)
+    monkeypatch.setattr(pipeline, "_ocr_pool", None)
+    monkeypatch.setattr(pipeline, "_ocr_pdf_page", lambda job: (job[1], f"page {job[1]}", 0.0))
+
+    first = list(pipeline.iter_pdf_pages(_scanned_pdf(tmp_path / "a.pdf"), ocr_workers=2))
+    second = list(pipeline.iter_pdf_pages(_scanned_pdf(tmp_path / "b.pdf"), ocr_workers=2))
+
+    assert [page["text"] for page in first] == ["page 0", "page 1"]
+    assert [page["method"] for page in second] == ["ocr", "ocr"]
+    assert created == [(2, "spawn")]
+    pipeline._ocr_pool.shutdown()
+
+
+def test_pages_are_routed_individually(tmp_path, monkeypatch):
+    doc = fitz.open()
+    text_page = doc.new_page()
+    text_page.insert_text((72, 72), "The Tenant shall pay the monthly rent on the first day of every month.")
+    doc.new_page() # blank: no text layer at all
+    scanned = doc.new_page()
+    scan = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 200, 260), 0)
+    scan.clear_with(230)
+    scanned.insert_image(scanned.rect, pixmap=scan)
+    scanned.insert_text((72, 40), "CASE NO. 12 OF 2024") # a digital stamp over the scan
+    path = str(tmp_path / "mixed.pdf")
+    doc.save(path)
+    doc.close()
+
+    ocr_calls = []
+
+    def fake_ocr(job):
+        ocr_calls.append(job[1])
+        return job[1], "ocr text", 0.0
+
+    monkeypatch.setattr(pipeline, "_ocr_pdf_page", fake_ocr)
+    pages = list(pipeline.iter_pdf_pages(path, ocr_workers=1))
+
+    assert [page["method"] for page in pages] == ["digital", "ocr", "ocr"]
+    assert pages[0]["text"].startswith("The Tenant shall pay")
+    assert ocr_calls == [1, 2]
+
+    with fitz.open(path) as reopened:
+        assert pipeline.image_coverage(reopened[0]) == 0.0
+        assert pipeline.image_coverage(reopened[2]) >= pipeline.SCANNED_PAGE_IMAGE_COVERAGE
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.information_extraction.response_cache import ResponseCache
+
+
+def test_normalized_question_hits():
+    cache = ResponseCache()
+    cache.put("doc1", "Who are the parties?", ["c1", "c2"], "A and B")
+
+    assert cache.get("doc1", "  who are the PARTIES ", ["c2", "c1"]) == "A and B"
+    assert cache.get("doc2", "Who are the parties?", ["c1", "c2"]) is None
+    assert cache.get("doc1", "Who are the parties?", ["c3"]) is None
+    assert cache.hit_rate() == 1 / 3
+
+
+def test_similar_question_uses_embedding():
+    vectors = {"who are the parties": [1.0, 0.0], "who are the parties involved": [0.99, 0.05], "how do i terminate": [0.0, 1.0]}
+    cache = ResponseCache(embed_fn=lambda question: vectors[question])
+    cache.put("doc1", "Who are the parties?", ["c1"], "A and B")
+
+    assert cache.get("doc1", "Who are the parties involved?", ["c1"]) == "A and B"
+    assert cache.get("doc1", "How do I terminate?", ["c1"]) is None
+    assert cache.stats["semantic_hits"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=-1)
+    cache.put("doc1", "q1", [], "a1")
+    assert cache.get("doc1", "q1", []) is None # already expired
+
+    cache = ResponseCache(max_entries=2)
+    cache.put("doc1", "q1", [], "a1")
+    cache.put("doc1", "q2", [], "a2")
+    cache.get("doc1", "q1", [])
+    cache.put("doc1", "q3", [], "a3")
+    assert cache.get("doc1", "q2", []) is None
+    assert cache.get("doc1", "q1", []) == "a1"
@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.legal_doc_check import (
+    STRONG_SIGNALS,
+    negative_patterns,
+    scan_text,
+    signal_score_from_scan,
+    is_negative_pattern,
+)
+
+SAMPLES = [
+    "WHEREAS the Vendor (hereinafter \"Vendor\") agrees. IN WITNESS WHEREOF the parties sign under the governing law of India.",
+    "FIR No. 12 lodged at Sector 17 Police Station under section 420 IPC by the complainant against the accused.",
+    "INVOICE no 55. Bill to: Jane. Payment due in 30 days. Total amount due: $500. Kind regards, Accounts. CC: finance",
+    "Curriculum Vitae. Career objective: seeking a position. GPA 3.9, Bachelor of Science. Internship at TechCorp.",
+    "AGREEMENT between A and bill to B. " * 50,
+    # Two signals start at the same offset
+    "AGREEMENT\nbetween John and Jane and others",
+]
+
+
+def old_signal_score(text):
+    score = 0
+    for pattern in [p for patterns in STRONG_SIGNALS.values() for p in patterns]:
+        if re.search(pattern, text[:2000], re.IGNORECASE):
+            score = min(score + 0.1, 0.4)
+    return score
+
+
+def old_negative_counts(text):
+    hits = {}
+    for name, pattern in negative_patterns.items():
+        matches = len(re.findall(pattern, text, re.IGNORECASE))
+        if matches:
+            hits[name] = matches
+    return sum(hits.values()), max(hits.values(), default=0)
+
+
+def test_scanner_matches_per_pattern_results():
+    for text in SAMPLES:
+        assert signal_score_from_scan(scan_text(text)) == old_signal_score(text)
+        assert is_negative_pattern(text) == old_negative_counts(text)
+
+
+def test_scan_reports_categories_and_positions():
+    text = "Bill to: Jane. The plaintiff filed a writ petition."
+    scan = scan_text(text)
+
+    assert scan["negative"] == {"invoice_receipt": 1}
+    assert scan["positive"] == {"court_litigation": 2}
+    assert scan["positions"]["invoice_receipt"] == [0]
+    assert text[scan["positions"]["court_litigation"][0]:].startswith("plaintiff")
+
+
+def test_signals_only_count_in_preview():
+    text = "x" * 2500 + " notwithstanding"
+    assert scan_text(text)["signals"] == set()
+    assert scan_text(text, preview_chars=3000)["signals"] == {"contracts_agreements__3"}
+
+
+def test_fast_path_decides_clear_cut_documents_without_models(monkeypatch):
+    from src import legal_doc_check
+
+    def no_model():
+        raise AssertionError("the classifier should not be loaded")
+
+    monkeypatch.setattr(legal_doc_check, "get_classifier", no_model)
+
+    contract = "WHEREAS the plaintiff (hereinafter the Buyer), notwithstanding the sale deed and the affidavit, witnesseth"
+    assert legal_doc_check.is_legal_document(contract, fast_path=True)[0] is True
+    assert legal_doc_check.is_legal_document("Hope this email finds you well. Best regards", fast_path=True)[0] is False
+    # The negative-pattern rule applies even with the fast path off
+    invoice = "Invoice no 7. Bill to: Jane. Payment due. Total amount due: $5"
+    assert legal_doc_check.is_legal_document(invoice, fast_path=False)[0] is False
+
+
+def test_batch_only_sends_undecided_documents_to_the_models(monkeypatch):
+    from src import legal_doc_check
+
+    classified = []
+    judged = []
+
+    def fake_classifier(previews, labels, hypothesis_template=None, batch_size=None):
+        classified.append(list(previews))
+        # The memo is clearly not legal; the other document lands in the gray zone
+        results = []
+        for text in previews:
+            if "memo" in text:
+                results.append({"labels": [labels[-1]], "scores": [1.0]})
+            else:
+                results.append({"labels": [labels[0]], "scores": [0.9]})
+        return results
+
+    def fake_judge(prompts, batch_size=None):
+        judged.append(list(prompts))
+        return [[{"generated_text": "yes"}] for _ in prompts]
+
+    monkeypatch.setattr(legal_doc_check, "get_classifier", lambda: fake_classifier)
+    monkeypatch.setattr(legal_doc_check, "get_judge_model", lambda: fake_judge)
+
+    contract = "WHEREAS the plaintiff (hereinafter the Buyer), notwithstanding the sale deed and the affidavit, witnesseth"
+    memo = "A short memo about the office picnic."
+    email = "Hope this email finds you well. Best regards"
+    unclear = "Some notes that could be anything at all."
+    verdicts = legal_doc_check.is_legal_documents([contract, memo, email, unclear], fast_path=True)
+
+    assert [is_legal for is_legal, _ in verdicts] == [True, False, False, True]
+    assert "regex fast path" in verdicts[0][1] and "regex fast path" in verdicts[2][1]
+    assert verdicts[1][1].startswith("Rejected: Identified as")
+    assert verdicts[3][1].startswith("Accepted by Judge")
+    assert classified == [[memo, unclear]]
+    assert len(judged) == 1 and len(judged[0]) == 1 and unclear in judged[0][0]
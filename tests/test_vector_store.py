@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.vector_store import CosdataVectorStore, LocalVectorStore
+
+
+def test_search_filters_by_session_and_document():
+    store = LocalVectorStore(dimension=3)
+    store.upsert(
+        ["a", "b", "c"],
+        [[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0]],
+        [
+            {"session_id": "s1", "doc_name": "lease.pdf", "text": "rent"},
+            {"session_id": "s2", "doc_name": "lease.pdf", "text": "rent again"},
+            {"session_id": "s1", "doc_name": "lease.pdf", "text": "inspection"},
+        ],
+    )
+
+    hits = store.search([1, 0, 0], top_k=5, filters={"session_id": "s1", "doc_name": "lease.pdf"})
+
+    assert [hit["id"] for hit in hits] == ["a", "c"]
+    assert hits[0]["score"] > hits[1]["score"]
+
+
+def test_upsert_replaces_existing_id():
+    store = LocalVectorStore(dimension=2)
+    store.upsert(["a"], [[1, 0]], [{"text": "old"}])
+    store.upsert(["a"], [[0, 1]], [{"text": "new"}])
+
+    assert store.count() == 1
+    assert store.search([0, 1], top_k=1)[0]["metadata"]["text"] == "new"
+
+
+def test_persists_and_reopens_memory_mapped(tmp_path):
+    store = LocalVectorStore(str(tmp_path), dimension=2)
+    store.upsert(["a", "b"], [[1, 0], [0, 1]], [{"doc_name": "x"}, {"doc_name": "y"}])
+    store.save()
+
+    reopened = LocalVectorStore(str(tmp_path), dimension=2)
+    assert reopened.count() == 2
+    assert reopened.search([0, 1], top_k=1)[0]["id"] == "b"
+
+    # Writing after a memory-mapped load must not touch the file until save()
+    reopened.upsert(["c"], [[1, 1]], [{"doc_name": "x"}])
+    assert reopened.delete({"doc_name": "x"}) == 2
+    assert [hit["id"] for hit in reopened.search([1, 0])] == ["b"]
+
+
+def test_save_rewrites_only_changed_documents(tmp_path):
+    store = LocalVectorStore(str(tmp_path), dimension=2)
+    store.upsert(["a"], [[1, 0]], [{"doc_hash": "h1"}])
+    store.save()
+    first_file = store._segment_path("h1", ".npy")
+    written = os.stat(first_file).st_mtime_ns
+
+    store.upsert(["b"], [[0, 1]], [{"doc_hash": "h2"}])
+    store.save()
+    assert os.stat(first_file).st_mtime_ns == written
+
+    # A filtered search opens only that document's segment
+    reopened = LocalVectorStore(str(tmp_path), dimension=2)
+    assert reopened.count() == 2
+    assert [hit["id"] for hit in reopened.search([1, 0], filters={"doc_hash": "h2"})] == ["b"]
+    assert reopened._segments["h1"] is None
+
+
+def test_refresh_sees_other_writers(tmp_path):
+    reader = LocalVectorStore(str(tmp_path), dimension=2)
+    writer = LocalVectorStore(str(tmp_path), dimension=2)
+    writer.upsert(["a", "b"], [[1, 0], [0, 1]], [{"doc_hash": "h1"}, {"doc_hash": "h2"}])
+    writer.save()
+
+    reader.refresh()
+    assert reader.count() == 2
+
+    writer.refresh()
+    assert writer.delete({"doc_hash": "h1"}) == 1
+    writer.save()
+    reader.refresh()
+    assert [hit["id"] for hit in reader.search([1, 0])] == ["b"]
+    assert not os.path.exists(writer._segment_path("h1", ".npy"))
+
+
+def test_converts_a_single_file_store(tmp_path):
+    np.save(tmp_path / "vectors.npy", np.array([[1, 0], [0, 1]], dtype=np.float32))
+    (tmp_path / "metadata.json").write_text(json.dumps({"ids": ["a", "b"], "metadatas": [{"doc_hash": "h1"}, {"doc_hash": "h2"}]}))
+
+    store = LocalVectorStore(str(tmp_path), dimension=2)
+    assert store.search([0, 1], top_k=1, filters={"doc_hash": "h2"})[0]["id"] == "b"
+    store.save()
+    assert not os.path.exists(tmp_path / "vectors.npy")
+    assert LocalVectorStore(str(tmp_path), dimension=2).count() == 2
+
+
+class FakeDenseSearch:
+    """Cosdata's collection.search.dense over a fixed ranking; records the requested top_k values."""
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+        self.fetches = []
+
+    def dense(self, query_vector, top_k):
+        self.fetches.append(top_k)
+        return {"results": self.ranking[:top_k]}
+
+
+def _cosdata_store(ranking):
+    store = CosdataVectorStore.__new__(CosdataVectorStore) # no server connection
+    store.collection = type("Collection", (), {})()
+    store.collection.search = FakeDenseSearch(ranking)
+    return store
+
+
+def test_cosdata_filtered_search_fetches_until_enough_match():
+    # The wanted document's chunks rank behind 50 chunks of other documents
+    ranking = [{"id": f"x{n}", "score": 1.0, "metadata": {"doc_hash": "other"}} for n in range(50)]
+    ranking += [{"id": f"a{n}", "score": 0.5, "metadata": {"doc_hash": "h1"}} for n in range(3)]
+    store = _cosdata_store(ranking)
+
+    hits = store.search([1, 0], top_k=2, filters={"doc_hash": "h1"})
+    assert [hit["id"] for hit in hits] == ["a0", "a1"]
+    assert store.collection.search.fetches == [8, 32, 128]
+
+
+def test_cosdata_filtered_search_stops_when_the_collection_is_exhausted(capsys):
+    ranking = [{"id": "a0", "score": 0.5, "metadata": {"doc_hash": "h1"}},
+               {"id": "x0", "score": 0.4, "metadata": {"doc_hash": "other"}}]
+    store = _cosdata_store(ranking)
+
+    assert [hit["id"] for hit in store.search([1, 0], top_k=5, filters={"doc_hash": "h1"})] == ["a0"]
+    assert store.collection.search.fetches == [20]
+    assert "only 1 of 5" in capsys.readouterr().out
+
+
+def test_cosdata_filtered_search_stops_growing_without_new_matches():
+    ranking = [{"id": f"a{n}", "score": 1.0, "metadata": {"doc_hash": "h1"}} for n in range(2)]
+    ranking += [{"id": f"x{n}", "score": 0.5, "metadata": {"doc_hash": "other"}} for n in range(5000)]
+    store = _cosdata_store(ranking)
+
+    assert len(store.search([1, 0], top_k=20, filters={"doc_hash": "h1"})) == 2
+    assert store.collection.search.fetches == [80, 320]
+
+
+def test_cosdata_filtered_search_is_capped():
+    ranking = [{"id": f"x{n}", "score": 0.5, "metadata": {"doc_hash": "other"}} for n in range(10000)]
+    store = _cosdata_store(ranking)
+
+    assert store.search([1, 0], top_k=5, filters={"doc_hash": "h1"}) == []
+    assert max(store.collection.search.fetches) == CosdataVectorStore.MAX_FETCH
+
+
+def test_delete_by_ids_within_a_document():
+    store = LocalVectorStore(dimension=2)
+    store.upsert(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], [{"doc_hash": "h1"}, {"doc_hash": "h1"}, {"doc_hash": "h2"}])
+
+    assert store.delete({"doc_hash": "h1"}, ids=["a", "c"]) == 1
+    assert sorted(hit["id"] for hit in store.search([1, 1], top_k=5)) == ["b", "c"]
+
+
+def test_cosdata_filtered_delete_needs_ids():
+    store = _cosdata_store([])
+    with pytest.raises(ValueError):
+        store.delete({"doc_hash": "h1"})